@@ -325,6 +325,7 @@ c17.set_transform(Translation(-0.5, -8.5, 8) * large)
 w.objects.append(c17)
 
 
-canvas = c.render(w)
-with open("cover2.ppm", "w") as f:
-    f.write(canvas.to_ppm())
+if __name__ == "__main__":
+    canvas = c.render_tiled(w)
+    with open("cover2.ppm", "w") as f:
+        canvas.write_ppm(f)
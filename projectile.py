@@ -35,4 +35,4 @@ while p.position.y > 0:
     t += 1
 
 with open("image.ppm", "w") as f:
-    f.write(c.to_ppm())
+    c.write_ppm(f)
@@ -1,7 +1,11 @@
 import math
-import copy
+from array import array
 
 EPSILON = 0.0001
+# The smallest positive float32, and the most float32 rounding can move a
+# value c (at most c * FLOAT32_HALF_STEP).
+FLOAT32_TINY = 2.0 ** -149
+FLOAT32_HALF_STEP = 2.0 ** -24
 
 
 def equal(a: float, b: float) -> bool:
@@ -16,6 +20,8 @@ def clamp(n: float, minn: int, maxn: int):
 
 
 class Tuple:
+    __slots__ = ("x", "y", "z", "w")
+
     def __init__(self, x: float, y: float, z: float, w: float):
         self.x = x
         self.y = y
@@ -60,17 +66,57 @@ class Tuple:
         )
 
     def magnitude(self) -> float:
-        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
 
     def normalize(self):
-        m = self.magnitude()
-        return self.__class__(self.x / m, self.y / m, self.z / m, self.w / m)
+        x, y, z = self.x, self.y, self.z
+        m = math.sqrt(x * x + y * y + z * z)
+        return self.__class__(x / m, y / m, z / m, self.w / m)
 
     def dot(self, other):
         return self.x * other.x + self.y * other.y + self.z * other.z + self.w * other.w
 
     def reflect(self, other):
-        return self - other * 2 * self.dot(other)
+        return self.multiply_add(other, -2 * self.dot(other))
+
+    # Fused and in-place helpers for the shading loops. The in-place forms
+    # mutate and return self, so only use them on tuples you just created.
+    def multiply_add(self, other, factor: float):
+        return self.__class__(
+            self.x + other.x * factor,
+            self.y + other.y * factor,
+            self.z + other.z * factor,
+            self.w + other.w * factor,
+        )
+
+    def multiply_add_in_place(self, other, factor: float):
+        self.x += other.x * factor
+        self.y += other.y * factor
+        self.z += other.z * factor
+        self.w += other.w * factor
+        return self
+
+    def add_in_place(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        self.w += other.w
+        return self
+
+    def scale_in_place(self, factor: float):
+        self.x *= factor
+        self.y *= factor
+        self.z *= factor
+        self.w *= factor
+        return self
+
+    def normalize_in_place(self):
+        m = math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        self.x /= m
+        self.y /= m
+        self.z /= m
+        self.w /= m
+        return self
 
     def __str__(self) -> str:
         return f"x: {self.x}, y: {self.y}, z: {self.z}, w: {self.w}"
@@ -84,24 +130,39 @@ class Tuple:
 
 
 class Point(Tuple):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, z: float, w: float = 1.0):
-        super().__init__(x, y, z, w)
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = w
 
     def __str__(self) -> str:
         return f"Point ({self.x}, {self.y}, {self.z})"
 
 
 class Vector(Tuple):
+    __slots__ = ()
+
     def __init__(self, x: float, y: float, z: float, w: float = 0.0):
-        super().__init__(x, y, z, w)
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = w
 
     def __str__(self) -> str:
         return f"Vector <{self.x}, {self.y}, {self.z}>"
 
 
 class Color(Tuple):
+    __slots__ = ()
+
     def __init__(self, r: float, g: float, b: float, w: float = 0.0):
-        super().__init__(r, g, b, w)
+        self.x = r
+        self.y = g
+        self.z = b
+        self.w = w
 
     @property
     def red(self):
@@ -130,10 +191,7 @@ class Color(Tuple):
 
     def __mul__(self, other):
         if isinstance(other, Color):
-            r = self.red * other.red
-            g = self.green * other.green
-            b = self.blue * other.blue
-            return Color(r, g, b)
+            return Color(self.x * other.x, self.y * other.y, self.z * other.z)
         else:
             return super().__mul__(other)
 
@@ -142,48 +200,158 @@ class Color(Tuple):
 
 
 class Canvas:
+    # Pixels live in one flat float32 array, three channels per pixel in
+    # row-major order, rather than as a Color object each. That is 12 bytes
+    # a pixel, and the PPM writers read the buffer directly.
     def __init__(self, width: int, height: int, color: Color = None):
         self.width = width
         self.height = height
         if color is None:
             color = Color(0, 0, 0)
-        self.pixels = [[color] * width for _ in range(height)]
+        self.buffer = array("f", [color.x, color.y, color.z]) * (width * height)
 
-    def _build_header(self):
-        return f"P3\n{self.width} {self.height}\n255\n"
+    # A read-only snapshot that builds a Color for every pixel on each
+    # access, so it costs what the flat buffer saves. Use read_pixel, or the
+    # buffer itself, in anything that runs often, and write_pixel/write_row
+    # to change pixels.
+    @property
+    def pixels(self):
+        return tuple(
+            tuple(self.read_pixel(x, y) for x in range(self.width))
+            for y in range(self.height)
+        )
 
-    def to_ppm(self):
-        header = self._build_header()
-        pixel_data = ""
-        for row in self.pixels:
-            ppm_row = []
-            for elem in row:
-                (r, g, b) = elem.to_rgb()
-                ppm_row.extend([r, g, b])
-            for line in [ppm_row[i : i + 17] for i in range(0, len(ppm_row), 17)]:
-                pixel_data = pixel_data + " ".join(str(c) for c in line) + "\n"
-        return header + pixel_data
+    def _build_header(self, magic: str = "P3"):
+        return f"{magic}\n{self.width} {self.height}\n255\n"
+
+    def _rgb_row(self, y: int):
+        # Same rounding as Color.to_rgb, inlined since it runs per channel.
+        # Storing 0.8 as float32 nudges it up, so 0.8 * 255 would round to
+        # 205 instead of 204. When rounding could have moved the value past
+        # an integer like that, that integer is used.
+        ceil = math.ceil
+        frexp = math.frexp
+        start = y * self.width * 3
+        values = []
+        append = values.append
+        for c in memoryview(self.buffer)[start : start + self.width * 3]:
+            s = c * 255
+            v = ceil(s)
+            if s - (v - 1) <= s * FLOAT32_HALF_STEP:
+                # Within half a float32 step of c exactly?
+                if s - (v - 1) <= 255 * 2.0 ** (frexp(c)[1] - 25):
+                    v -= 1
+            append(0 if v < 0 else 255 if v > 255 else v)
+        return values
+
+    def _ppm_rows(self):
+        for y in range(self.height):
+            values = self._rgb_row(y)
+            yield "".join(
+                " ".join(map(str, values[i : i + 17])) + "\n"
+                for i in range(0, len(values), 17)
+            )
 
+    def to_ppm(self):
+        return self._build_header() + "".join(self._ppm_rows())
+
+    def to_ppm_binary(self):
+        data = bytearray(self._build_header("P6").encode("ascii"))
+        for y in range(self.height):
+            data += bytes(self._rgb_row(y))
+        return bytes(data)
+
+    # Streams the image a row at a time. P3 needs a file opened in text
+    # mode, binary P6 one opened with "wb".
+    def write_ppm(self, f, binary: bool = False):
+        if binary:
+            f.write(self._build_header("P6").encode("ascii"))
+            for y in range(self.height):
+                f.write(bytes(self._rgb_row(y)))
+        else:
+            f.write(self._build_header())
+            for row in self._ppm_rows():
+                f.write(row)
+
+    # The flat buffer would quietly wrap an out of range x onto a
+    # neighbouring row, so coordinates are checked first.
+    def _index(self, x: int, y: int) -> int:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"pixel ({x}, {y}) is outside the canvas")
+        return (y * self.width + x) * 3
+
+    # Positive values too small for float32 are stored as FLOAT32_TINY
+    # rather than 0, so they still round up to 1 in the PPM output.
     def write_pixel(self, x: int, y: int, color: Color):
-        self.pixels[y][x] = color
+        i = self._index(x, y)
+        tiny = FLOAT32_TINY
+        self.buffer[i] = tiny if 0 < color.x < tiny else color.x
+        self.buffer[i + 1] = tiny if 0 < color.y < tiny else color.y
+        self.buffer[i + 2] = tiny if 0 < color.z < tiny else color.z
 
     def read_pixel(self, x, y):
-        return self.pixels[y][x]
+        i = self._index(x, y)
+        return Color(self.buffer[i], self.buffer[i + 1], self.buffer[i + 2])
+
+    # Bulk writes. write_span copies a flat r, g, b, r, g, b... run starting
+    # at (x, y); it may carry on into the following rows. write_row and
+    # write_tile take Colors, like write_pixel.
+    def write_span(self, x: int, y: int, values):
+        i = self._index(x, y)
+        if not isinstance(values, array):
+            tiny = FLOAT32_TINY
+            values = array("f", [tiny if 0 < v < tiny else v for v in values])
+        if i + len(values) > len(self.buffer):
+            raise IndexError("span runs past the end of the canvas")
+        self.buffer[i : i + len(values)] = values
+
+    def write_row(self, y: int, colors, x: int = 0):
+        values = []
+        for color in colors:
+            values.extend((color.x, color.y, color.z))
+        self.write_span(x, y, values)
+
+    def write_tile(self, x0: int, y0: int, rows):
+        for y, row in enumerate(rows, y0):
+            self.write_row(y, row, x0)
+
+
+class _Row(list):
+    # Lets a Matrix notice writes like m[1][2] = x, so anything caching a
+    # value derived from it (an inverse, say) can tell when it goes stale.
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner, values):
+        super().__init__(values)
+        self._owner = owner
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._owner.version += 1
+        Matrix.edits += 1
 
 
 class Matrix:
+    # In-place edits made to any Matrix so far. Caches that depend on many
+    # matrices (a group's bounds, say) only need to look at each of them
+    # again when this has changed.
+    edits = 0
+
     def __init__(self, matrix):
         self.size = len(matrix)
         for x in matrix:
             if len(x) != self.size:
                 raise TypeError
-        self.matrix = matrix
+        self.version = 0
+        self.matrix = [_Row(self, row) for row in matrix]
 
     def __getitem__(self, index):
         return self.matrix[index]
 
     def __setitem__(self, index, value):
-        self.matrix[index] = value
+        self.matrix[index] = _Row(self, value)
+        self.version += 1
+        Matrix.edits += 1
 
     def __eq__(self, other) -> bool:
         if self.size != other.size:
@@ -210,6 +378,12 @@ class Matrix:
                 Tuple(self[3][0], self[3][1], self[3][2], self[3][3]).dot(other),
             )
 
+    def is_affine(self) -> bool:
+        return self.size == 4 and self[3] == [0, 0, 0, 1]
+
+    def to_affine(self):
+        return Affine(self)
+
     def transpose(self):
         m = [[0] * self.size for _ in range(self.size)]
         for row in range(self.size):
@@ -220,13 +394,17 @@ class Matrix:
     def determinant(self):
         if self.size == 2:
             return self[0][0] * self[1][1] - self[0][1] * self[1][0]
+        if self.size == 3:
+            return self._determinant3()
+        if self.size == 4:
+            return self._determinant4()
         sum = 0
         for col in range(self.size):
             sum += self[0][col] * self.cofactor(0, col)
         return sum
 
     def sub(self, row, col):
-        tmp = copy.deepcopy(self.matrix)
+        tmp = [list(r) for r in self.matrix]
         del tmp[row]
         for row in tmp:
             del row[col]
@@ -239,6 +417,10 @@ class Matrix:
         return self.determinant() != 0
 
     def inverse(self):
+        if self.size == 3:
+            return self._inverse3()
+        if self.size == 4:
+            return self._inverse4()
         if not self.invertible():
             print("Not Invertible")
             raise TypeError
@@ -250,6 +432,112 @@ class Matrix:
                 m[col][row] = c / d
         return Matrix(m)
 
+    # Closed-form 3x3 and 4x4 paths. The 4x4 case shares the 2x2
+    # sub-determinants of the top two and bottom two rows between the
+    # determinant and every cofactor, so no submatrices are built.
+    def _determinant3(self):
+        (a, b, c), (d, e, f), (g, h, i) = self.matrix
+        return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+    def _inverse3(self):
+        (a, b, c), (d, e, f), (g, h, i) = self.matrix
+        c00 = e * i - f * h
+        c01 = f * g - d * i
+        c02 = d * h - e * g
+        det = a * c00 + b * c01 + c * c02
+        if det == 0:
+            print("Not Invertible")
+            raise TypeError
+        return Matrix(
+            [
+                [c00 / det, (c * h - b * i) / det, (b * f - c * e) / det],
+                [c01 / det, (a * i - c * g) / det, (c * d - a * f) / det],
+                [c02 / det, (b * g - a * h) / det, (a * e - b * d) / det],
+            ]
+        )
+
+    def _sub_determinants4(self):
+        (a00, a01, a02, a03), (a10, a11, a12, a13) = self.matrix[0], self.matrix[1]
+        (a20, a21, a22, a23), (a30, a31, a32, a33) = self.matrix[2], self.matrix[3]
+        s = (
+            a00 * a11 - a10 * a01,
+            a00 * a12 - a10 * a02,
+            a00 * a13 - a10 * a03,
+            a01 * a12 - a11 * a02,
+            a01 * a13 - a11 * a03,
+            a02 * a13 - a12 * a03,
+        )
+        c = (
+            a20 * a31 - a30 * a21,
+            a20 * a32 - a30 * a22,
+            a20 * a33 - a30 * a23,
+            a21 * a32 - a31 * a22,
+            a21 * a33 - a31 * a23,
+            a22 * a33 - a32 * a23,
+        )
+        return s, c
+
+    def _determinant4(self):
+        s, c = self._sub_determinants4()
+        return (
+            s[0] * c[5]
+            - s[1] * c[4]
+            + s[2] * c[3]
+            + s[3] * c[2]
+            - s[4] * c[1]
+            + s[5] * c[0]
+        )
+
+    def _inverse4(self):
+        s, c = self._sub_determinants4()
+        det = (
+            s[0] * c[5]
+            - s[1] * c[4]
+            + s[2] * c[3]
+            + s[3] * c[2]
+            - s[4] * c[1]
+            + s[5] * c[0]
+        )
+        if det == 0:
+            print("Not Invertible")
+            raise TypeError
+        (a00, a01, a02, a03), (a10, a11, a12, a13) = self.matrix[0], self.matrix[1]
+        (a20, a21, a22, a23), (a30, a31, a32, a33) = self.matrix[2], self.matrix[3]
+        if a30 == 0 and a31 == 0 and a32 == 0 and a33 == 1:
+            # The inverse of an affine transform is affine. Write its bottom
+            # row exactly; the cofactor sums can round 1 to 1 +- 1 ulp.
+            bottom = [0, 0, 0, 1]
+        else:
+            bottom = [
+                (-a10 * c[3] + a11 * c[1] - a12 * c[0]) / det,
+                (a00 * c[3] - a01 * c[1] + a02 * c[0]) / det,
+                (-a30 * s[3] + a31 * s[1] - a32 * s[0]) / det,
+                (a20 * s[3] - a21 * s[1] + a22 * s[0]) / det,
+            ]
+        return Matrix(
+            [
+                [
+                    (a11 * c[5] - a12 * c[4] + a13 * c[3]) / det,
+                    (-a01 * c[5] + a02 * c[4] - a03 * c[3]) / det,
+                    (a31 * s[5] - a32 * s[4] + a33 * s[3]) / det,
+                    (-a21 * s[5] + a22 * s[4] - a23 * s[3]) / det,
+                ],
+                [
+                    (-a10 * c[5] + a12 * c[2] - a13 * c[1]) / det,
+                    (a00 * c[5] - a02 * c[2] + a03 * c[1]) / det,
+                    (-a30 * s[5] + a32 * s[2] - a33 * s[1]) / det,
+                    (a20 * s[5] - a22 * s[2] + a23 * s[1]) / det,
+                ],
+                [
+                    (a10 * c[4] - a11 * c[2] + a13 * c[0]) / det,
+                    (-a00 * c[4] + a01 * c[2] - a03 * c[0]) / det,
+                    (a30 * s[4] - a31 * s[2] + a33 * s[0]) / det,
+                    (-a20 * s[4] + a21 * s[2] - a23 * s[0]) / det,
+                ],
+                bottom,
+            ]
+        )
+
     def cofactor(self, row, col):
         minor = self.minor(row, col)
         if (row + col) % 2 == 1:
@@ -263,6 +551,74 @@ class Matrix:
         )
 
 
+class Affine:
+    # A 4x4 transform whose bottom row is 0 0 0 1, stored as its 3x3 linear
+    # part plus translation. Applying it skips the implied fourth row and
+    # builds a single result tuple.
+    __slots__ = (
+        "m00",
+        "m01",
+        "m02",
+        "m03",
+        "m10",
+        "m11",
+        "m12",
+        "m13",
+        "m20",
+        "m21",
+        "m22",
+        "m23",
+    )
+
+    def __init__(self, matrix: Matrix):
+        if matrix.size != 4 or (
+            not equal(matrix[3][0], 0)
+            or not equal(matrix[3][1], 0)
+            or not equal(matrix[3][2], 0)
+            or not equal(matrix[3][3], 1)
+        ):
+            raise TypeError("Matrix is not an affine transform")
+        (self.m00, self.m01, self.m02, self.m03) = matrix[0]
+        (self.m10, self.m11, self.m12, self.m13) = matrix[1]
+        (self.m20, self.m21, self.m22, self.m23) = matrix[2]
+
+    def apply_point(self, p: Tuple) -> Point:
+        x, y, z = p.x, p.y, p.z
+        return Point(
+            self.m00 * x + self.m01 * y + self.m02 * z + self.m03,
+            self.m10 * x + self.m11 * y + self.m12 * z + self.m13,
+            self.m20 * x + self.m21 * y + self.m22 * z + self.m23,
+        )
+
+    def apply_vector(self, v: Tuple) -> Vector:
+        x, y, z = v.x, v.y, v.z
+        return Vector(
+            self.m00 * x + self.m01 * y + self.m02 * z,
+            self.m10 * x + self.m11 * y + self.m12 * z,
+            self.m20 * x + self.m21 * y + self.m22 * z,
+        )
+
+    def apply_transpose(self, v: Tuple) -> Vector:
+        # Applied to an inverse transform this maps normals out of object
+        # space, like multiplying by the full inverse-transpose matrix.
+        x, y, z = v.x, v.y, v.z
+        return Vector(
+            self.m00 * x + self.m10 * y + self.m20 * z,
+            self.m01 * x + self.m11 * y + self.m21 * z,
+            self.m02 * x + self.m12 * y + self.m22 * z,
+        )
+
+    def to_matrix(self) -> Matrix:
+        return Matrix(
+            [
+                [self.m00, self.m01, self.m02, self.m03],
+                [self.m10, self.m11, self.m12, self.m13],
+                [self.m20, self.m21, self.m22, self.m23],
+                [0, 0, 0, 1],
+            ]
+        )
+
+
 class Identity(Matrix):
     def __init__(self):
         super().__init__([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
@@ -0,0 +1,142 @@
+from raytracer.base import Point, Matrix, EPSILON, equal
+from raytracer.rays import Ray
+import math
+
+
+class BoundingBox:
+    def __init__(self, minimum: Point = None, maximum: Point = None):
+        if minimum is None:
+            minimum = Point(math.inf, math.inf, math.inf)
+        if maximum is None:
+            maximum = Point(-math.inf, -math.inf, -math.inf)
+        self.min = minimum
+        self.max = maximum
+
+    def is_empty(self) -> bool:
+        return (
+            self.min.x > self.max.x
+            or self.min.y > self.max.y
+            or self.min.z > self.max.z
+        )
+
+    def is_finite(self) -> bool:
+        return not self.is_empty() and all(
+            math.isfinite(c)
+            for c in (
+                self.min.x,
+                self.min.y,
+                self.min.z,
+                self.max.x,
+                self.max.y,
+                self.max.z,
+            )
+        )
+
+    def add_point(self, point: Point):
+        self.min = Point(
+            min(self.min.x, point.x), min(self.min.y, point.y), min(self.min.z, point.z)
+        )
+        self.max = Point(
+            max(self.max.x, point.x), max(self.max.y, point.y), max(self.max.z, point.z)
+        )
+
+    def add_box(self, other):
+        if other.is_empty():
+            return
+        self.add_point(other.min)
+        self.add_point(other.max)
+
+    def contains_point(self, point: Point) -> bool:
+        return (
+            self.min.x <= point.x <= self.max.x
+            and self.min.y <= point.y <= self.max.y
+            and self.min.z <= point.z <= self.max.z
+        )
+
+    def contains_box(self, other) -> bool:
+        return self.contains_point(other.min) and self.contains_point(other.max)
+
+    def centroid(self) -> Point:
+        return Point(
+            (self.min.x + self.max.x) / 2,
+            (self.min.y + self.max.y) / 2,
+            (self.min.z + self.max.z) / 2,
+        )
+
+    def transform(self, m: Matrix):
+        if self.is_empty():
+            return BoundingBox()
+        # Transform the extents axis by axis rather than the eight corners so
+        # that infinite boxes (planes, open cylinders) stay well defined.
+        lo = [self.min.x, self.min.y, self.min.z]
+        hi = [self.max.x, self.max.y, self.max.z]
+        new_min = []
+        new_max = []
+        for row in range(3):
+            a = m[row][3]
+            b = m[row][3]
+            for col in range(3):
+                e = m[row][col]
+                # Rotations leave entries like cos(pi / 2) that are zero in
+                # all but name; don't let them smear an infinite extent.
+                if e == 0 or (
+                    abs(e) < EPSILON and not math.isfinite(hi[col] - lo[col])
+                ):
+                    continue
+                x = e * lo[col]
+                y = e * hi[col]
+                if x < y:
+                    a += x
+                    b += y
+                else:
+                    a += y
+                    b += x
+            new_min.append(a)
+            new_max.append(b)
+        return BoundingBox(Point(*new_min), Point(*new_max))
+
+    def intersects(
+        self, ray: Ray, t_min: float = -math.inf, t_max: float = math.inf
+    ) -> bool:
+        tmin, tmax = self.intersection_range(ray)
+        return tmin <= tmax and tmax > t_min and tmin < t_max
+
+    def intersection_range(self, ray: Ray) -> (float, float):
+        tmin = -math.inf
+        tmax = math.inf
+        for origin, direction, lo, hi in (
+            (ray.origin.x, ray.direction.x, self.min.x, self.max.x),
+            (ray.origin.y, ray.direction.y, self.min.y, self.max.y),
+            (ray.origin.z, ray.direction.z, self.min.z, self.max.z),
+        ):
+            if direction == 0:
+                if origin < lo or origin > hi:
+                    return (math.inf, -math.inf)
+                continue
+            t0 = (lo - origin) / direction
+            t1 = (hi - origin) / direction
+            if t0 > t1:
+                t0, t1 = (t1, t0)
+            if t0 > tmin:
+                tmin = t0
+            if t1 < tmax:
+                tmax = t1
+            if tmin > tmax:
+                return (tmin, tmax)
+        return (tmin, tmax)
+
+    def __eq__(self, other):
+        return all(
+            a == b or equal(a, b)
+            for a, b in (
+                (self.min.x, other.min.x),
+                (self.min.y, other.min.y),
+                (self.min.z, other.min.z),
+                (self.max.x, other.max.x),
+                (self.max.y, other.max.y),
+                (self.max.z, other.max.z),
+            )
+        )
+
+    def __str__(self):
+        return f"BoundingBox: min: {self.min}, max: {self.max}"
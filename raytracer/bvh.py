@@ -0,0 +1,163 @@
+from raytracer.bounds import BoundingBox
+from raytracer.rays import Ray, Intersections
+import math
+
+LEAF_SIZE = 4
+
+
+class BVHNode:
+    def __init__(self, box: BoundingBox, shapes=None, left=None, right=None):
+        self.box = box
+        self.shapes = shapes
+        self.left = left
+        self.right = right
+
+    def is_leaf(self) -> bool:
+        return self.shapes is not None
+
+
+class BVH:
+    def __init__(self, shapes, leaf_size: int = LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.root = None
+        self.unbounded = []
+        self.build(shapes)
+
+    def build(self, shapes):
+        # Shapes with infinite extent (planes, open cylinders and cones) can't
+        # be partitioned, so they are kept aside and tested against every ray.
+        bounded = []
+        self.unbounded = []
+        for shape in shapes:
+            box = shape.parent_space_bounds()
+            if box.is_empty():
+                continue
+            if box.is_finite():
+                bounded.append((box, box.centroid(), shape))
+            else:
+                self.unbounded.append(shape)
+        self.root = self._build_node(bounded) if bounded else None
+
+    def rebuild(self, shapes):
+        self.build(shapes)
+
+    def _build_node(self, entries):
+        box = BoundingBox()
+        for entry in entries:
+            box.add_box(entry[0])
+        if len(entries) <= self.leaf_size:
+            return BVHNode(box, shapes=[entry[2] for entry in entries])
+
+        centroids = BoundingBox()
+        for entry in entries:
+            centroids.add_point(entry[1])
+        extents = (
+            centroids.max.x - centroids.min.x,
+            centroids.max.y - centroids.min.y,
+            centroids.max.z - centroids.min.z,
+        )
+        if max(extents) <= 0:
+            return BVHNode(box, shapes=[entry[2] for entry in entries])
+
+        axis = extents.index(max(extents))
+        key = ("x", "y", "z")[axis]
+        entries = sorted(entries, key=lambda entry: getattr(entry[1], key))
+        mid = len(entries) // 2
+        return BVHNode(
+            box,
+            left=self._build_node(entries[:mid]),
+            right=self._build_node(entries[mid:]),
+        )
+
+    def bounds(self) -> BoundingBox:
+        box = BoundingBox()
+        if self.root is not None:
+            box.add_box(self.root.box)
+        for shape in self.unbounded:
+            box.add_box(shape.parent_space_bounds())
+        return box
+
+    def intersect(
+        self, ray: Ray, t_min: float = -math.inf, t_max: float = math.inf
+    ) -> Intersections:
+        xs = Intersections()
+        for shape in self.unbounded:
+            xs.extend(shape.intersect(ray, t_min, t_max))
+        if self.root is None:
+            return xs
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if not node.box.intersects(ray, t_min, t_max):
+                continue
+            if node.is_leaf():
+                for shape in node.shapes:
+                    xs.extend(shape.intersect(ray, t_min, t_max))
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return xs
+
+    def hit(self, ray: Ray, t_min: float = 0, t_max: float = math.inf):
+        hit = None
+        for shape in self.unbounded:
+            i = shape.hit(ray, t_min, t_max)
+            if i is not None:
+                hit = i
+                t_max = i.t
+        if self.root is None:
+            return hit
+        # Visit the nearer child first and shrink t_max as hits are found, so
+        # that subtrees entirely behind the closest hit are never opened.
+        stack = [(-math.inf, self.root)]
+        while stack:
+            tnear, node = stack.pop()
+            if tnear >= t_max:
+                continue
+            if node.is_leaf():
+                for shape in node.shapes:
+                    i = shape.hit(ray, t_min, t_max)
+                    if i is not None:
+                        hit = i
+                        t_max = i.t
+                continue
+            children = []
+            for child in (node.left, node.right):
+                tmin, tmax = child.box.intersection_range(ray)
+                if tmin <= tmax and tmax > t_min and tmin < t_max:
+                    children.append((tmin, child))
+            if len(children) == 2 and children[0][0] < children[1][0]:
+                children.reverse()
+            stack.extend(children)
+        return hit
+
+    def any_hit(self, ray: Ray, max_distance: float) -> bool:
+        for shape in self.unbounded:
+            if shape.any_hit(ray, max_distance):
+                return True
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            tmin, tmax = node.box.intersection_range(ray)
+            if tmin > tmax or tmax <= 0 or tmin >= max_distance:
+                continue
+            if node.is_leaf():
+                for shape in node.shapes:
+                    if shape.any_hit(ray, max_distance):
+                        return True
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return False
+
+    def __len__(self):
+        count = len(self.unbounded)
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.is_leaf():
+                count += len(node.shapes)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return count
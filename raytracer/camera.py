@@ -1,12 +1,33 @@
-from raytracer.base import Identity, Canvas, Matrix, Point
+from raytracer.base import Identity, Canvas, Matrix, Point, Vector
 from raytracer.world import World
 from raytracer.rays import Ray
+from raytracer.wavefront import render_wavefront, BATCH_SIZE
+from raytracer.progress import RenderProgress
 
 import math
+import multiprocessing
+import os
+
+TILE_SIZE = 32
+
+# Set once per worker process by _init_worker, so the scene is pickled and
+# sent to each worker a single time rather than with every tile.
+_worker_scene = None
+
+
+def _init_worker(camera, world):
+    global _worker_scene
+    _worker_scene = (camera, world)
+
+
+def _render_tile(tile):
+    camera, world = _worker_scene
+    return camera.render_tile(world, *tile)
 
 
 class Camera:
     def __init__(self, hsize: int, vsize: int, fov: float, transform: Matrix = None):
+        self._view = None
         self.hsize = hsize
         self.vsize = vsize
         self.fov = fov
@@ -15,34 +36,194 @@ class Camera:
         else:
             self.transform = transform
 
+    # Everything derived from the size, field of view and transform is
+    # computed once and dropped when any of them is replaced (or the
+    # transform is edited in place).
+    @property
+    def hsize(self) -> int:
+        return self._hsize
+
+    @hsize.setter
+    def hsize(self, hsize: int):
+        self._hsize = hsize
+        self._view = None
+
+    @property
+    def vsize(self) -> int:
+        return self._vsize
+
+    @vsize.setter
+    def vsize(self, vsize: int):
+        self._vsize = vsize
+        self._view = None
+
+    @property
+    def fov(self) -> float:
+        return self._fov
+
+    @fov.setter
+    def fov(self, fov: float):
+        self._fov = fov
+        self._view = None
+
+    @property
+    def transform(self) -> Matrix:
+        return self._transform
+
+    @transform.setter
+    def transform(self, t: Matrix):
+        self._transform = t
+        self._view = None
+
+    def _setup(self):
+        if self._view is not None and self._view_version == self._transform.version:
+            return
         half_view = math.tan(self.fov / 2)
         aspect = self.hsize / self.vsize
         if aspect >= 1:
-            self.half_width = half_view
-            self.half_height = half_view / aspect
+            half_width = half_view
+            half_height = half_view / aspect
         else:
-            self.half_width = half_view * aspect
-            self.half_height = half_view
-        self.pixel_size = (self.half_width * 2) / self.hsize
+            half_width = half_view * aspect
+            half_height = half_view
+        self._half_width = half_width
+        self._half_height = half_height
+        self._pixel_size = (half_width * 2) / self.hsize
+        self._inverse = self._transform.inverse()
+        self._origin = self._inverse * Point(0, 0, 0)
+        self._view_version = self._transform.version
+        # A pixel's point on the canvas at z = -1 is x * column + y * row +
+        # forward + origin in world space, so ray directions only need the
+        # inverse transform's first three columns.
+        m = self._inverse
+        self._view = tuple((m[0][k], m[1][k], m[2][k]) for k in range(3))
+
+    @property
+    def half_width(self) -> float:
+        self._setup()
+        return self._half_width
+
+    @property
+    def half_height(self) -> float:
+        self._setup()
+        return self._half_height
+
+    @property
+    def pixel_size(self) -> float:
+        self._setup()
+        return self._pixel_size
+
+    @property
+    def inverse(self) -> Matrix:
+        self._setup()
+        return self._inverse
+
+    @property
+    def origin(self) -> Point:
+        self._setup()
+        return self._origin
+
+    def _columns(self, x0: int, x1: int):
+        # World-space offset of each pixel column's centre along the canvas.
+        cx, cy, cz = self._view[0]
+        columns = []
+        for x in range(x0, x1):
+            world_x = self._half_width - (x + 0.5) * self._pixel_size
+            columns.append((world_x * cx, world_x * cy, world_x * cz))
+        return columns
+
+    def _rows(self, y0: int, y1: int):
+        # Same for rows, with the step towards the canvas folded in.
+        (rx, ry, rz), (fx, fy, fz) = self._view[1:]
+        rows = []
+        for y in range(y0, y1):
+            world_y = self._half_height - (y + 0.5) * self._pixel_size
+            rows.append((world_y * rx - fx, world_y * ry - fy, world_y * rz - fz))
+        return rows
 
     def ray_for_pixel(self, px, py):
-        x_offset = (px + 0.5) * self.pixel_size
-        y_offset = (py + 0.5) * self.pixel_size
+        self._setup()
+        (cx, cy, cz), (rx, ry, rz) = self._columns(px, px + 1) + self._rows(py, py + 1)
+        return self._ray(cx + rx, cy + ry, cz + rz)
+
+    def _ray(self, dx, dy, dz):
+        m = math.sqrt(dx * dx + dy * dy + dz * dz)
+        return Ray(self._origin, Vector(dx / m, dy / m, dz / m))
 
-        world_x = self.half_width - x_offset
-        world_y = self.half_height - y_offset
+    def rays(self, x0: int = 0, y0: int = 0, x1: int = None, y1: int = None):
+        # Yields (x, y, ray) for every pixel of a tile, row by row; by default
+        # the whole frame. All rays share one origin.
+        self._setup()
+        if x1 is None:
+            x1 = self.hsize
+        if y1 is None:
+            y1 = self.vsize
+        columns = self._columns(x0, x1)
+        make_ray = self._ray
+        for y, (rx, ry, rz) in enumerate(self._rows(y0, y1), y0):
+            for x, (cx, cy, cz) in enumerate(columns, x0):
+                yield (x, y, make_ray(cx + rx, cy + ry, cz + rz))
 
-        pixel = self.transform.inverse() * Point(world_x, world_y, -1)
-        origin = self.transform.inverse() * Point(0, 0, 0)
-        direction = (pixel - origin).normalize()
-        return Ray(origin, direction)
+    def row_rays(self, y: int):
+        return self.rays(0, y, self.hsize, y + 1)
 
-    def render(self, world: World):
+    # Every renderer takes an optional progress callback, called with a
+    # RenderProgress after each row, tile or batch. Pass print_progress
+    # from raytracer.progress for a running report on stderr.
+    def render_wavefront(
+        self, world: World, batch_size: int = BATCH_SIZE, progress=None
+    ):
+        return render_wavefront(self, world, batch_size, progress)
+
+    def render(self, world: World, progress=None):
         image = Canvas(self.hsize, self.vsize)
+        stats = RenderProgress(progress, self.vsize, "row")
         for y in range(self.vsize):
-            print(y)
-            for x in range(self.hsize):
-                ray = self.ray_for_pixel(x, y)
-                color = world.color_at(ray)
-                image.write_pixel(x, y, color)
+            for x, _, ray in self.row_rays(y):
+                image.write_pixel(x, y, world.color_at(ray))
+            stats.update(1, self.hsize)
         return image
+
+    def tiles(self, tile_size: int = TILE_SIZE):
+        for y0 in range(0, self.vsize, tile_size):
+            for x0 in range(0, self.hsize, tile_size):
+                yield (
+                    x0,
+                    y0,
+                    min(x0 + tile_size, self.hsize),
+                    min(y0 + tile_size, self.vsize),
+                )
+
+    def render_tile(self, world: World, x0: int, y0: int, x1: int, y1: int):
+        rows = [[] for _ in range(y0, y1)]
+        for _, y, ray in self.rays(x0, y0, x1, y1):
+            rows[y - y0].append(world.color_at(ray))
+        return rows
+
+    def render_tiled(
+        self,
+        world: World,
+        workers: int = None,
+        tile_size: int = TILE_SIZE,
+        progress=None,
+    ):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        image = Canvas(self.hsize, self.vsize)
+        tiles = list(self.tiles(tile_size))
+        stats = RenderProgress(progress, len(tiles), "tile")
+        if workers <= 1:
+            results = (self.render_tile(world, *tile) for tile in tiles)
+            self._write_tiles(image, tiles, results, stats)
+            return image
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(self, world)
+        ) as pool:
+            results = pool.imap(_render_tile, tiles)
+            self._write_tiles(image, tiles, results, stats)
+        return image
+
+    def _write_tiles(self, image: Canvas, tiles, results, stats: RenderProgress):
+        for (x0, y0, x1, y1), rows in zip(tiles, results):
+            image.write_tile(x0, y0, rows)
+            stats.update(1, (x1 - x0) * (y1 - y0))
@@ -52,23 +52,24 @@ class Material:
         normalv: Vector,
         in_shadow: bool = False,
     ) -> Color:
-        diffuse = Color(0, 0, 0)
-        specular = Color(0, 0, 0)
         if self.pattern is not None:
             color = self.pattern.pattern_at_shape(object, position)
         else:
             color = self.color
         effective_color = color * light.intensity
-        lightv = (light.position - position).normalize()
-        ambient = effective_color * self.ambient
+        # ambient is a fresh tuple, so diffuse and specular are accumulated
+        # into it in place rather than allocating a Color per term.
+        result = effective_color * self.ambient
         if in_shadow:
-            return ambient
+            return result
+        lightv = (light.position - position).normalize_in_place()
         light_dot_normal = lightv.dot(normalv)
         if light_dot_normal >= 0:
-            diffuse = effective_color * self.diffuse * light_dot_normal
-            reflectv = -lightv.reflect(normalv)
-            reflect_dot_eye = reflectv.dot(eyev)
+            result.multiply_add_in_place(
+                effective_color, self.diffuse * light_dot_normal
+            )
+            reflect_dot_eye = -lightv.reflect(normalv).dot(eyev)
             if reflect_dot_eye > 0:
                 factor = math.pow(reflect_dot_eye, self.shininess)
-                specular = light.intensity * self.specular * factor
-        return ambient + diffuse + specular
+                result.multiply_add_in_place(light.intensity, self.specular * factor)
+        return result
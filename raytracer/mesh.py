@@ -0,0 +1,508 @@
+from raytracer.shapes import Shape, Triangle, SmoothTriangle
+from raytracer.base import Point, Vector, EPSILON
+from raytracer.bounds import BoundingBox
+from raytracer.rays import Ray, Intersection, Intersections
+from array import array
+import itertools
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Faces per leaf of a mesh's face tree. Larger than the scene BVH's leaves:
+# a face test costs about the same as a node test, and fewer nodes also make
+# the tree cheaper to build.
+FACE_LEAF_SIZE = 8
+
+# Upper bound on rays x triangles tested in one NumPy step of the batched
+# intersector, to keep its temporary arrays small.
+PACKET_SIZE = 1 << 18
+
+
+def _owned(values) -> array:
+    # Meshes loaded from a cache hold read-only memoryviews of the mapped
+    # file (see objcache); one is copied into an array the first time it has
+    # to change.
+    if isinstance(values, array):
+        return values
+    copy = array(values.format)
+    copy.frombytes(values.cast("B"))
+    return copy
+
+
+class TriangleMesh(Shape):
+    # Vertices, faces and per-face edges/normals live in flat arrays instead
+    # of one Triangle object per face. The vertex and vertex normal buffers
+    # may be shared between meshes (the parser uses one of each for every
+    # group). Faces with vertex normals are shaded smoothly; the others use
+    # their face normal.
+    def __init__(self, vertices: array = None, vertex_normals: array = None):
+        self.vertices = vertices if vertices is not None else array("d")
+        if vertex_normals is None:
+            vertex_normals = array("d")
+        self.vertex_normals = vertex_normals
+        self.faces = array("l")
+        self.face_vertex_normals = array("l")
+        self._edges = array("d")
+        self._normals = array("d")
+        self._tree = None
+        self._arrays = None
+        super().__init__()
+
+    def add_vertex(self, point: Point) -> int:
+        self.vertices = _owned(self.vertices)
+        self.vertices.extend((point.x, point.y, point.z))
+        return len(self.vertices) // 3 - 1
+
+    def vertex(self, index: int) -> Point:
+        i = 3 * index
+        v = self.vertices
+        return Point(v[i], v[i + 1], v[i + 2])
+
+    def add_vertex_normal(self, normal: Vector) -> int:
+        self.vertex_normals = _owned(self.vertex_normals)
+        self.vertex_normals.extend((normal.x, normal.y, normal.z))
+        return len(self.vertex_normals) // 3 - 1
+
+    def vertex_normal(self, index: int) -> Vector:
+        i = 3 * index
+        n = self.vertex_normals
+        return Vector(n[i], n[i + 1], n[i + 2])
+
+    # n1..n3 index vertex_normals; -1 means the face is flat shaded.
+    def add_face(
+        self, i1: int, i2: int, i3: int, n1: int = -1, n2: int = -1, n3: int = -1
+    ):
+        self._own_faces()
+        self.faces.extend((i1, i2, i3))
+        self.face_vertex_normals.extend((n1, n2, n3) if n1 >= 0 else (-1, -1, -1))
+        self._changed()
+
+    def add_polygon(self, indices, normal_indices=None):
+        self._own_faces()
+        first = indices[0]
+        for i in range(2, len(indices)):
+            self.faces.extend((first, indices[i - 1], indices[i]))
+            if normal_indices is None:
+                self.face_vertex_normals.extend((-1, -1, -1))
+            else:
+                self.face_vertex_normals.extend(
+                    (normal_indices[0], normal_indices[i - 1], normal_indices[i])
+                )
+        self._changed()
+
+    def add_faces(self, faces, face_vertex_normals):
+        # Many faces at once, as flat index arrays laid out like faces and
+        # face_vertex_normals.
+        self._own_faces()
+        self.faces.extend(faces)
+        self.face_vertex_normals.extend(face_vertex_normals)
+        self._changed()
+
+    def _own_faces(self):
+        self.faces = _owned(self.faces)
+        self.face_vertex_normals = _owned(self.face_vertex_normals)
+
+    def _changed(self):
+        if self._tree is not None or self._arrays is not None:
+            self._tree = None
+            self._arrays = None
+            if self.parent is not None:
+                self.parent._invalidate_bounds()
+
+    # Edges and face normals are filled in lazily, in bulk, for every face
+    # added since they were last needed; that keeps loading a mesh cheap.
+    @property
+    def edges(self) -> array:
+        self._prepare()
+        return self._edges
+
+    @property
+    def normals(self) -> array:
+        self._prepare()
+        return self._normals
+
+    def _prepare(self):
+        start = len(self._normals) // 3
+        if start == len(self):
+            return
+        f = self.faces
+        e1 = []
+        e2 = []
+        for axis in range(3):
+            c = self.vertices[axis::3]
+            a = [c[i] for i in f[3 * start :: 3]]
+            b = [c[i] for i in f[3 * start + 1 :: 3]]
+            d = [c[i] for i in f[3 * start + 2 :: 3]]
+            e1.append([y - x for x, y in zip(a, b)])
+            e2.append([y - x for x, y in zip(a, d)])
+        normals = []
+        for e1x, e1y, e1z, e2x, e2y, e2z in zip(*e1, *e2):
+            nx = e2y * e1z - e2z * e1y
+            ny = e2z * e1x - e2x * e1z
+            nz = e2x * e1y - e2y * e1x
+            m = math.sqrt(nx * nx + ny * ny + nz * nz)
+            # Degenerate faces are kept (so face ids match the file) but can
+            # never be hit, since their determinant is zero.
+            if m > 0:
+                normals += (nx / m, ny / m, nz / m)
+            else:
+                normals += (nx, ny, nz)
+        self._edges = _owned(self._edges)
+        self._normals = _owned(self._normals)
+        self._edges.extend(itertools.chain.from_iterable(zip(*e1, *e2)))
+        self._normals.extend(normals)
+
+    def __len__(self):
+        return len(self.faces) // 3
+
+    def triangle(self, face: int) -> Triangle:
+        i = 3 * face
+        points = [self.vertex(self.faces[i + k]) for k in range(3)]
+        normals = self.face_vertex_normals[i : i + 3]
+        if normals[0] < 0:
+            return Triangle(*points)
+        return SmoothTriangle(*points, *[self.vertex_normal(n) for n in normals])
+
+    def triangle_arrays(self):
+        # (p1, e1, e2) as (faces, 3) NumPy arrays for the batched intersector.
+        if np is None:
+            raise ImportError("Batched mesh intersection requires NumPy")
+        if self._arrays is None:
+            # Copies, so the shared array.array buffers can still grow.
+            v = np.array(self.vertices, dtype=float).reshape(-1, 3)
+            f = np.array(self.faces)
+            e = np.array(self.edges, dtype=float).reshape(-1, 6)
+            self._arrays = (v[f[0::3]], e[:, :3], e[:, 3:])
+        return self._arrays
+
+    def intersect_packet(self, origins, directions, t_min=0, t_max=math.inf):
+        # Nearest hit of every ray in a packet of world-space rays, as arrays
+        # of (face, t, u, v) with face -1 where a ray misses. The face tree is
+        # walked once for the whole packet, dropping rays as they leave it.
+        p1, e1, e2 = self.triangle_arrays()
+        m = self.world_inverse.to_matrix()
+        inv = np.array([list(row) for row in m.matrix], dtype=float)
+        o = np.asarray(origins, dtype=float) @ inv[:3, :3].T + inv[:3, 3]
+        d = np.asarray(directions, dtype=float) @ inv[:3, :3].T
+        count = len(o)
+        face = np.full(count, -1)
+        t = np.broadcast_to(np.asarray(t_max, dtype=float), (count,)).copy()
+        u = np.zeros(count)
+        v = np.zeros(count)
+        tree = self._build_tree()
+        if not tree.node_data or count == 0:
+            return face, t, u, v
+        bounds = np.array(tree.node_bounds, dtype=float).reshape(-1, 6)
+        data = tree.node_data
+        order = tree.order
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stack = [(0, np.arange(count))]
+            while stack:
+                node, rays = stack.pop()
+                lo = bounds[node, :3]
+                hi = bounds[node, 3:]
+                ro = o[rays]
+                rd = d[rays]
+                parallel = rd == 0
+                t0 = np.where(parallel, -np.inf, (lo - ro) / rd)
+                t1 = np.where(parallel, np.inf, (hi - ro) / rd)
+                tmin = np.minimum(t0, t1).max(axis=1)
+                tmax = np.maximum(t0, t1).min(axis=1)
+                outside = (parallel & ((ro < lo) | (ro > hi))).any(axis=1)
+                keep = ~outside & (tmin <= tmax) & (tmax > t_min) & (tmin < t[rays])
+                rays = rays[keep]
+                if len(rays) == 0:
+                    continue
+                size = data[2 * node + 1]
+                if size == 0:
+                    stack.append((data[2 * node], rays))
+                    stack.append((node + 1, rays))
+                    continue
+                offset = data[2 * node]
+                faces = np.array(order[offset : offset + size])
+                hit, ht, hu, hv = intersect_triangles(
+                    o[rays], d[rays], p1[faces], e1[faces], e2[faces], t_min, t[rays]
+                )
+                found = hit >= 0
+                rays = rays[found]
+                face[rays] = faces[hit[found]]
+                t[rays] = ht[found]
+                u[rays] = hu[found]
+                v[rays] = hv[found]
+        return face, t, u, v
+
+    def local_normal_at(self, point: Point, hit=None):
+        # The point alone doesn't say which face it is on.
+        if hit is None or hit.face is None:
+            raise TypeError("TriangleMesh normals need the hit that found the point")
+        i = 3 * hit.face
+        normals = self.face_vertex_normals[i : i + 3]
+        if normals[0] < 0 or hit.u is None:
+            return Vector(self.normals[i], self.normals[i + 1], self.normals[i + 2])
+        n1, n2, n3 = [self.vertex_normal(n) for n in normals]
+        return n2 * hit.u + n3 * hit.v + n1 * (1 - hit.u - hit.v)
+
+    def bounds(self) -> BoundingBox:
+        tree = self._build_tree()
+        if not tree.node_bounds:
+            return BoundingBox()
+        b = tree.node_bounds
+        return BoundingBox(Point(b[0], b[1], b[2]), Point(b[3], b[4], b[5]))
+
+    def _build_tree(self):
+        if self._tree is None:
+            self._tree = _FaceTree(self)
+        return self._tree
+
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
+        xs = Intersections()
+        self._build_tree().search(ray, t_min, t_max, xs=xs)
+        return xs
+
+    def local_hit(self, ray: Ray, t_min: float, t_max: float):
+        return self._build_tree().search(ray, t_min, t_max)
+
+    def local_any_hit(self, ray: Ray, max_distance: float) -> bool:
+        return self._build_tree().search(ray, 0, max_distance, any_hit=True) is not None
+
+
+def intersect_triangles(origins, directions, p1, e1, e2, t_min=0, t_max=math.inf):
+    # Batched Moller-Trumbore: every ray in (rays, 3) origins/directions
+    # against every triangle in (faces, 3) p1/e1/e2. Returns, per ray, the
+    # index of the nearest triangle hit in (t_min, t_max) (-1 for a miss)
+    # with its t and barycentric u/v. t_max may be a scalar or per ray.
+    if np is None:
+        raise ImportError("Batched triangle intersection requires NumPy")
+    origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=float).reshape(-1, 3)
+    count = len(origins)
+    t_max = np.broadcast_to(np.asarray(t_max, dtype=float), (count,))
+    index = np.full(count, -1)
+    best_t = t_max.copy()
+    best_u = np.zeros(count)
+    best_v = np.zeros(count)
+    if len(p1) == 0:
+        return index, best_t, best_u, best_v
+    step = max(1, PACKET_SIZE // len(p1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, count, step):
+            rows = slice(start, start + step)
+            o = origins[rows, None, :]
+            d = directions[rows, None, :]
+            dir_cross_e2 = np.cross(d, e2)
+            det = (e1 * dir_cross_e2).sum(axis=2)
+            f = 1.0 / det
+            p1_to_origin = o - p1
+            u = f * (p1_to_origin * dir_cross_e2).sum(axis=2)
+            origin_cross_e1 = np.cross(p1_to_origin, e1)
+            v = f * (d * origin_cross_e1).sum(axis=2)
+            t = f * (e2 * origin_cross_e1).sum(axis=2)
+            hit = (
+                (np.abs(det) >= EPSILON)
+                & (u >= 0)
+                & (u <= 1)
+                & (v >= 0)
+                & (u + v <= 1)
+                & (t > t_min)
+                & (t < t_max[rows, None])
+            )
+            t = np.where(hit, t, np.inf)
+            nearest = t.argmin(axis=1)
+            picked = np.arange(len(nearest))
+            found = hit[picked, nearest]
+            index[rows] = np.where(found, nearest, -1)
+            best_t[rows] = np.where(found, t[picked, nearest], best_t[rows])
+            best_u[rows] = np.where(found, u[picked, nearest], 0)
+            best_v[rows] = np.where(found, v[picked, nearest], 0)
+    return index, best_t, best_u, best_v
+
+
+class _FaceTree:
+    # A BVH over the faces of one mesh, stored as flat arrays. Nodes are laid
+    # out depth first: an interior node's left child follows it directly and
+    # node_data holds (right child, 0); a leaf holds (offset, count) into
+    # order, the face ids sorted by node.
+    def __init__(self, mesh: TriangleMesh, leaf_size: int = FACE_LEAF_SIZE):
+        self.mesh = mesh
+        self.leaf_size = leaf_size
+        self.node_bounds = array("d")
+        self.node_data = array("l")
+        self.order = array("l")
+        count = len(mesh)
+        if count == 0:
+            return
+        # Per-face boxes and centroids, one list per axis.
+        self.lo = []
+        self.hi = []
+        centroids = []
+        f = mesh.faces
+        for axis in range(3):
+            c = mesh.vertices[axis::3]
+            a = [c[i] for i in f[0::3]]
+            b = [c[i] for i in f[1::3]]
+            d = [c[i] for i in f[2::3]]
+            lo = list(map(min, a, b, d))
+            hi = list(map(max, a, b, d))
+            self.lo.append(lo)
+            self.hi.append(hi)
+            centroids.append([(x + y) / 2 for x, y in zip(lo, hi)])
+        self.centroids = centroids
+        # Sort the faces along each axis once; splitting a node then only has
+        # to partition these lists, keeping them sorted, instead of sorting
+        # again at every level.
+        orders = [
+            sorted(range(count), key=centroids[axis].__getitem__) for axis in range(3)
+        ]
+        self._build(orders)
+        del self.lo, self.hi, self.centroids
+
+    @classmethod
+    def restore(cls, mesh: TriangleMesh, node_bounds, node_data, order):
+        # A tree saved earlier (see objcache), without rebuilding it.
+        tree = cls.__new__(cls)
+        tree.mesh = mesh
+        tree.leaf_size = FACE_LEAF_SIZE
+        tree.node_bounds = node_bounds
+        tree.node_data = node_data
+        tree.order = order
+        return tree
+
+    def _build(self, orders):
+        node = len(self.node_data) // 2
+        self.node_bounds.extend((0.0,) * 6)
+        self.node_data.extend((0, 0))
+        faces = orders[0]
+        c = self.centroids
+        extents = [
+            c[axis][orders[axis][-1]] - c[axis][orders[axis][0]] for axis in range(3)
+        ]
+        if len(faces) <= self.leaf_size or max(extents) <= 0:
+            self.node_data[2 * node] = len(self.order)
+            self.node_data[2 * node + 1] = len(faces)
+            self.order.extend(faces)
+            bounds = [min(map(self.lo[axis].__getitem__, faces)) for axis in range(3)]
+            bounds += [max(map(self.hi[axis].__getitem__, faces)) for axis in range(3)]
+            self.node_bounds[6 * node : 6 * node + 6] = array("d", bounds)
+            return
+
+        axis = extents.index(max(extents))
+        mid = len(faces) // 2
+        left = orders[axis][:mid]
+        in_left = set(left).__contains__
+        halves = []
+        for other in range(3):
+            if other == axis:
+                halves.append((left, orders[axis][mid:]))
+            else:
+                order = orders[other]
+                halves.append(
+                    (
+                        list(filter(in_left, order)),
+                        list(itertools.filterfalse(in_left, order)),
+                    )
+                )
+        self._build([half[0] for half in halves])
+        right = len(self.node_data) // 2
+        self.node_data[2 * node] = right
+        self._build([half[1] for half in halves])
+        b = self.node_bounds
+        lb = 6 * (node + 1)
+        rb = 6 * right
+        bounds = [min(b[lb + k], b[rb + k]) for k in range(3)]
+        bounds += [max(b[lb + k], b[rb + k]) for k in range(3, 6)]
+        b[6 * node : 6 * node + 6] = array("d", bounds)
+
+    def _node_range(self, node, origin, direction):
+        b = self.node_bounds
+        i = 6 * node
+        tmin = -math.inf
+        tmax = math.inf
+        for axis in range(3):
+            o = origin[axis]
+            d = direction[axis]
+            lo = b[i + axis]
+            hi = b[i + 3 + axis]
+            if d == 0:
+                if o < lo or o > hi:
+                    return (math.inf, -math.inf)
+                continue
+            t0 = (lo - o) / d
+            t1 = (hi - o) / d
+            if t0 > t1:
+                t0, t1 = (t1, t0)
+            if t0 > tmin:
+                tmin = t0
+            if t1 < tmax:
+                tmax = t1
+            if tmin > tmax:
+                break
+        return (tmin, tmax)
+
+    def search(self, ray: Ray, t_min, t_max, xs=None, any_hit=False):
+        # Returns the nearest Intersection in (t_min, t_max), or None. If xs is
+        # given every hit in the interval is appended to it instead.
+        best = None
+        if not self.node_data:
+            return best
+        mesh = self.mesh
+        v = mesh.vertices
+        f = mesh.faces
+        e = mesh.edges
+        data = self.node_data
+        order = self.order
+        origin = (ray.origin.x, ray.origin.y, ray.origin.z)
+        direction = (ray.direction.x, ray.direction.y, ray.direction.z)
+        ox, oy, oz = origin
+        dx, dy, dz = direction
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            tmin, tmax = self._node_range(node, origin, direction)
+            if tmin > tmax or tmax <= t_min or tmin >= t_max:
+                continue
+            count = data[2 * node + 1]
+            if count == 0:
+                stack.append(data[2 * node])
+                stack.append(node + 1)
+                continue
+            offset = data[2 * node]
+            for face in order[offset : offset + count]:
+                i = 6 * face
+                e1x, e1y, e1z, e2x, e2y, e2z = e[i : i + 6]
+                # Möller–Trumbore, as in Triangle.local_intersect.
+                px = dy * e2z - dz * e2y
+                py = dz * e2x - dx * e2z
+                pz = dx * e2y - dy * e2x
+                det = e1x * px + e1y * py + e1z * pz
+                if abs(det) < EPSILON:
+                    continue
+                inv_det = 1.0 / det
+                p1 = 3 * f[3 * face]
+                sx = ox - v[p1]
+                sy = oy - v[p1 + 1]
+                sz = oz - v[p1 + 2]
+                u = inv_det * (sx * px + sy * py + sz * pz)
+                if u < 0 or u > 1:
+                    continue
+                qx = sy * e1z - sz * e1y
+                qy = sz * e1x - sx * e1z
+                qz = sx * e1y - sy * e1x
+                w = inv_det * (dx * qx + dy * qy + dz * qz)
+                if w < 0 or (u + w) > 1:
+                    continue
+                t = inv_det * (e2x * qx + e2y * qy + e2z * qz)
+                if not t_min < t < t_max:
+                    continue
+                hit = Intersection(t, mesh, face=face, u=u, v=w)
+                if xs is not None:
+                    xs.append(hit)
+                    continue
+                best = hit
+                if any_hit:
+                    return best
+                t_max = t
+        return best
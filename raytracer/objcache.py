@@ -0,0 +1,184 @@
+from raytracer.mesh import _FaceTree
+from array import array
+import copyreg
+import json
+import mmap
+import os
+import sys
+
+# A parsed OBJ file (in mesh mode) saved as: MAGIC, a little-endian uint32
+# header length, a JSON header, then the raw contents of every array, each
+# starting on an 8 byte boundary. The header records the source file's
+# path, size and mtime so a stale cache is never used.
+MAGIC = b"PYTRMESH"
+VERSION = 1
+SUFFIX = ".meshcache"
+
+
+def cache_path(path: str) -> str:
+    return path + SUFFIX
+
+
+def _source_key(path: str) -> dict:
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": array("l").itemsize,
+    }
+
+
+def write(parser, path: str, cache: str = None, build_tree: bool = True):
+    if cache is None:
+        cache = cache_path(path)
+    sections = []
+    blobs = []
+
+    def add(name, values):
+        # values may be an array or a view of another cache file.
+        view = memoryview(values)
+        sections.append((name, view.format, len(view)))
+        blobs.append(view)
+
+    add("vertices", parser.vertex_buffer)
+    add("normals", parser.normal_buffer)
+    add("textures", parser.texture_buffer)
+    groups = []
+    for name, group in [(None, parser.default_group)] + list(
+        parser.named_groups.items()
+    ):
+        mesh = parser.meshes.get(group)
+        entry = {"name": name, "mesh": mesh is not None}
+        groups.append(entry)
+        if mesh is None:
+            continue
+        prefix = f"group{len(groups) - 1}."
+        add(prefix + "faces", mesh.faces)
+        add(prefix + "face_vertex_normals", mesh.face_vertex_normals)
+        add(prefix + "edges", mesh.edges)
+        add(prefix + "face_normals", mesh.normals)
+        if build_tree:
+            tree = mesh._build_tree()
+            entry["tree"] = True
+            add(prefix + "node_bounds", tree.node_bounds)
+            add(prefix + "node_data", tree.node_data)
+            add(prefix + "order", tree.order)
+
+    header = _source_key(path)
+    header.update(
+        ignored=parser.ignored,
+        lines=parser.lines,
+        errors=parser.errors,
+        groups=groups,
+        sections=sections,
+    )
+    data = json.dumps(header).encode()
+    # Write under a temporary name so a reader never sees a partial file.
+    partial = cache + ".partial"
+    with open(partial, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(data).to_bytes(4, "little"))
+        f.write(data)
+        for values in blobs:
+            f.write(b"\0" * (-f.tell() % 8))
+            f.write(values)
+    os.replace(partial, cache)
+
+
+def read(parser, path: str, cache: str = None) -> bool:
+    # Fills an empty parser from the cache. Returns False, leaving the parser
+    # untouched, when there is no cache or it doesn't match the source.
+    if cache is None:
+        cache = cache_path(path)
+    try:
+        header, arrays = _read_sections(cache, _source_key(path))
+    except (OSError, ValueError, KeyError):
+        return False
+    if header is None:
+        return False
+
+    parser.ignored = header["ignored"]
+    parser.lines = header["lines"]
+    parser.errors = [tuple(error) for error in header["errors"]]
+    parser.vertex_buffer = arrays["vertices"]
+    parser.normal_buffer = arrays["normals"]
+    parser.texture_buffer = arrays["textures"]
+    for index, entry in enumerate(header["groups"]):
+        parser.set_group(entry["name"])
+        if not entry["mesh"]:
+            continue
+        prefix = f"group{index}."
+        mesh = parser.current_mesh()
+        mesh.faces = arrays[prefix + "faces"]
+        mesh.face_vertex_normals = arrays[prefix + "face_vertex_normals"]
+        mesh._edges = arrays[prefix + "edges"]
+        mesh._normals = arrays[prefix + "face_normals"]
+        if entry.get("tree"):
+            mesh._tree = _FaceTree.restore(
+                mesh,
+                arrays[prefix + "node_bounds"],
+                arrays[prefix + "node_data"],
+                arrays[prefix + "order"],
+            )
+    parser.set_group(None)
+    return True
+
+
+def _read_sections(cache: str, key: dict):
+    # Sections come back as read-only memoryviews of the mapped file, so a
+    # load copies nothing. The map stays open while any view of it is alive,
+    # and meshes copy a view into an array the first time they change it.
+    with open(cache, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header, layout = _read_header(data, key)
+    except (ValueError, KeyError):
+        data.close()
+        raise
+    if header is None:
+        data.close()
+        return (None, None)
+    view = memoryview(data)
+    arrays = {}
+    for name, typecode, start, end in layout:
+        arrays[name] = view[start:end].cast(typecode)
+    return (header, arrays)
+
+
+def _read_header(data, key: dict):
+    if data[: len(MAGIC)] != MAGIC:
+        return (None, None)
+    start = len(MAGIC) + 4
+    end = start + int.from_bytes(data[len(MAGIC) : start], "little")
+    header = json.loads(data[start:end].decode())
+    if any(header.get(name) != value for name, value in key.items()):
+        return (None, None)
+    layout = []
+    offset = end
+    for name, typecode, count in header["sections"]:
+        offset += -offset % 8
+        size = count * array(typecode).itemsize
+        if offset + size > len(data):
+            raise ValueError("truncated mesh cache")
+        layout.append((name, typecode, offset, offset + size))
+        offset += size
+    return (header, layout)
+
+
+def _reduce_view(view: memoryview):
+    return (_from_bytes, (view.format, view.tobytes()))
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    return values
+
+
+# Meshes holding views are still sent to render_tiled's worker processes:
+# views pickle as plain arrays, and pickle's memo keeps a buffer that several
+# meshes share as one copy.
+copyreg.pickle(memoryview, _reduce_view)
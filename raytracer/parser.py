@@ -1,55 +1,270 @@
-from raytracer.base import Point
-from raytracer.shapes import Group, Triangle
+from raytracer.base import Point, Vector
+from raytracer.shapes import Group, Triangle, SmoothTriangle
+from raytracer.mesh import TriangleMesh, _owned
+from raytracer.bvh import LEAF_SIZE
+from raytracer import objcache
+from array import array
+import io
+import multiprocessing
+import os
+
+# Lines between calls to a Parser's progress callback.
+PROGRESS_INTERVAL = 100000
+
+# Bytes of the file per range in Parser.parse_file's parallel mode.
+CHUNK_SIZE = 1 << 24
 
 
 class Parser:
-    def __init__(self, file):
+    # With mesh=True faces go into one TriangleMesh per group, all sharing
+    # the parser's vertex buffers, instead of one Triangle object per face.
+    # progress, if given, is called as progress(lines, ignored) every
+    # PROGRESS_INTERVAL lines and once at the end. Lines that look like
+    # records but can't be read are counted as ignored and kept in errors
+    # as (line number, text). With file=None nothing is parsed.
+    def __init__(self, file=None, mesh: bool = False, progress=None):
         self.ignored = 0
-        self.vertices = [Point(0, 0, 0)]  # Add a point to start actual vertices at 1
+        self.lines = 0
+        self.errors = []
+        self.mesh = mesh
+        self.progress = progress
+        # Add a point to start actual vertices at 1
+        self.vertex_buffer = array("d", (0.0, 0.0, 0.0))
+        self.normal_buffer = array("d", (0.0, 0.0, 0.0))
+        self.texture_buffer = array("d", (0.0, 0.0))
         self.named_groups = {}
         self.default_group = Group()
         self.current_group = self.default_group
+        self.meshes = {}
+        self._lists = {}
+        if file is not None:
+            self.parse(file)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        mesh: bool = True,
+        cache=True,
+        progress=None,
+        workers: int = 1,
+    ):
+        # Parses the file at path (see parse_file for workers), going through
+        # a binary cache when mesh is set: cache=True keeps it next to the
+        # file as <path>.meshcache, a string names the cache file, False
+        # skips it. A cache is only used while the file's size and mtime
+        # still match it.
+        parser = cls(mesh=mesh, progress=progress)
+        if not mesh or cache is False:
+            parser.parse_file(path, workers)
+            return parser
+        cache = None if cache is True else cache
+        if objcache.read(parser, path, cache):
+            return parser
+        parser.parse_file(path, workers)
+        try:
+            objcache.write(parser, path, cache)
+        except OSError:
+            pass  # A read-only directory only costs the next load a parse
+        return parser
+
+    def parse(self, file):
+        self._own_buffers()
+        vertices = self.vertex_buffer
+        progress = self.progress
         for line in file:
-            if line[0] == "v":
-                point_values = line.split(" ")
-                p = Point(
-                    float(point_values[1]),
-                    float(point_values[2]),
-                    float(point_values[3]),
-                )
-                self.vertices.append(p)
-            elif line[0] == "f":
-                point_i = line.split(" ")
-                print(list(map(lambda x: int(x), point_i[1:])))
-                ts = self.fan_triangulation(list(map(lambda x: int(x), point_i[1:])))
-                for t in ts:
-                    self.current_group.add_child(t)
-            elif line[0] == "g":
-                group_name = line.split(" ")[1].strip()
-                if self.get_named_group(group_name) is None:
-                    self.create_named_group(group_name)
-                self.current_group = self.named_groups[group_name]
-                print(self.named_groups)
-
-            else:
+            self.lines += 1
+            if progress is not None and self.lines % PROGRESS_INTERVAL == 0:
+                progress(self.lines, self.ignored)
+            tokens = line.split()
+            if not tokens or tokens[0][0] == "#":
+                continue
+            kind = tokens[0]
+            try:
+                if kind == "v":
+                    vertices.extend(
+                        (float(tokens[1]), float(tokens[2]), float(tokens[3]))
+                    )
+                elif kind == "f":
+                    self.parse_face(tokens)
+                elif kind == "vn":
+                    self.normal_buffer.extend(
+                        (float(tokens[1]), float(tokens[2]), float(tokens[3]))
+                    )
+                elif kind == "vt":
+                    v = float(tokens[2]) if len(tokens) > 2 else 0.0
+                    self.texture_buffer.extend((float(tokens[1]), v))
+                elif kind == "g":
+                    self.set_group(tokens[1] if len(tokens) > 1 else None)
+                else:
+                    self.ignored += 1
+            except (ValueError, IndexError):
                 self.ignored += 1
+                self.errors.append((self.lines, line.rstrip("\r\n")))
+        if progress is not None:
+            progress(self.lines, self.ignored)
+
+    def parse_face(self, tokens):
+        indices, normals = _face_indices(
+            tokens, len(self.vertex_buffer) // 3, len(self.normal_buffer) // 3
+        )
+        if self.mesh:
+            self.current_mesh().add_polygon(indices, normals)
+            return
+        for t in self.fan_triangulation(indices, normals):
+            self.current_group.add_child(t)
+
+    def parse_file(self, path: str, workers: int = 1, chunk_size=CHUNK_SIZE):
+        # With workers > 1 (None for one per CPU), files larger than
+        # chunk_size are split into byte ranges on line boundaries and parsed
+        # by a pool of worker processes, in two passes: the first reads the
+        # vertex records of every range, which gives each range's first
+        # global vertex index; the second reads faces and groups. The result
+        # is the same as parse() on the whole file. Worker processes need
+        # the calling script to have an if __name__ == "__main__": guard.
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1 or os.path.getsize(path) <= chunk_size:
+            with open(path, "r") as f:
+                self.parse(f)
+            return
+        self._own_buffers()
+        chunks = _line_ranges(path, chunk_size)
+        with multiprocessing.Pool(workers) as pool:
+            vertex_chunks = pool.map(_parse_vertex_chunk, chunks)
+            jobs = []
+            vertex_count = len(self.vertex_buffer) // 3
+            normal_count = len(self.normal_buffer) // 3
+            for chunk, (_, vertices, normals, textures, errors) in zip(
+                chunks, vertex_chunks
+            ):
+                skip = {line for line, _ in errors}
+                jobs.append((*chunk, vertex_count, normal_count, skip))
+                self.vertex_buffer.extend(vertices)
+                self.normal_buffer.extend(normals)
+                self.texture_buffer.extend(textures)
+                vertex_count += len(vertices) // 3
+                normal_count += len(normals) // 3
+            face_chunks = pool.imap(_parse_face_chunk, jobs)
+            for (lines, *_, vertex_errors), (head, groups, ignored, errors) in zip(
+                vertex_chunks, face_chunks
+            ):
+                self.add_faces(*head)
+                for name, faces, face_normals in groups:
+                    self.set_group(name)
+                    self.add_faces(faces, face_normals)
+                errors = sorted(vertex_errors + errors)
+                self.errors += [(self.lines + line, text) for line, text in errors]
+                self.ignored += len(vertex_errors) + ignored
+                self.lines += lines
+                if self.progress is not None:
+                    self.progress(self.lines, self.ignored)
+
+    def _own_buffers(self):
+        # After a cache load the buffers are read-only views of the cache
+        # file. Copy them before adding to them, and hand the copies to the
+        # meshes that share them.
+        self.vertex_buffer = _owned(self.vertex_buffer)
+        self.normal_buffer = _owned(self.normal_buffer)
+        self.texture_buffer = _owned(self.texture_buffer)
+        for mesh in self.meshes.values():
+            mesh.vertices = self.vertex_buffer
+            mesh.vertex_normals = self.normal_buffer
+
+    def add_faces(self, faces: array, face_normals: array):
+        # Triangles as flat vertex and vertex normal indices, three per face,
+        # with -1 normals for flat faces. Added to the current group.
+        if not faces:
+            return
+        if self.mesh:
+            self.current_mesh().add_faces(faces, face_normals)
+            return
+        for i in range(0, len(faces), 3):
+            normals = face_normals[i : i + 3] if face_normals[i] >= 0 else None
+            for t in self.fan_triangulation(faces[i : i + 3], normals):
+                self.current_group.add_child(t)
+
+    def set_group(self, group_name):
+        if group_name is None:
+            self.current_group = self.default_group
+            return
+        if self.get_named_group(group_name) is None:
+            self.create_named_group(group_name)
+        self.current_group = self.named_groups[group_name]
+
+    # Lists of every vertex, normal and texture coordinate, built from the
+    # buffers on first use and kept until a buffer grows or is replaced.
+    # vertex(i) and normal(i) read a single one without building anything.
+    @property
+    def vertices(self):
+        return self._listed("vertex_buffer", 3, self.vertex)
+
+    @property
+    def normals(self):
+        return self._listed("normal_buffer", 3, self.normal)
+
+    @property
+    def textures(self):
+        t = self.texture_buffer
+        return self._listed("texture_buffer", 2, lambda i: (t[2 * i], t[2 * i + 1]))
+
+    def _listed(self, name: str, width: int, item):
+        buffer = getattr(self, name)
+        cached = self._lists.get(name)
+        if cached is None or cached[0] is not buffer or cached[1] != len(buffer):
+            items = [item(i) for i in range(len(buffer) // width)]
+            cached = self._lists[name] = (buffer, len(buffer), items)
+        return cached[2]
 
-    def fan_triangulation(self, vertices_i):  # Takes indices of vertices
+    def vertex(self, index: int) -> Point:
+        i = 3 * index
+        v = self.vertex_buffer
+        return Point(v[i], v[i + 1], v[i + 2])
+
+    def normal(self, index: int) -> Vector:
+        i = 3 * index
+        n = self.normal_buffer
+        return Vector(n[i], n[i + 1], n[i + 2])
+
+    def current_mesh(self) -> TriangleMesh:
+        mesh = self.meshes.get(self.current_group)
+        if mesh is None:
+            mesh = TriangleMesh(self.vertex_buffer, self.normal_buffer)
+            self.current_group.add_child(mesh)
+            self.meshes[self.current_group] = mesh
+        return mesh
+
+    def fan_triangulation(self, vertices_i, normals_i=None):  # Takes indices
         ts = []
         for i in range(2, len(vertices_i)):
+            if normals_i is not None:
+                ts.append(
+                    SmoothTriangle(
+                        self.vertex(vertices_i[0]),
+                        self.vertex(vertices_i[i - 1]),
+                        self.vertex(vertices_i[i]),
+                        self.normal(normals_i[0]),
+                        self.normal(normals_i[i - 1]),
+                        self.normal(normals_i[i]),
+                    )
+                )
+                continue
             tri = Triangle(
-                self.vertices[vertices_i[0]],
-                self.vertices[vertices_i[i - 1]],
-                self.vertices[vertices_i[i]],
+                self.vertex(vertices_i[0]),
+                self.vertex(vertices_i[i - 1]),
+                self.vertex(vertices_i[i]),
             )
             ts.append(tri)
         return ts
 
-    def obj_to_group(self):
+    def obj_to_group(self, leaf_size: int = LEAF_SIZE):
+        # One child per group with any faces, each with its own bounds and
+        # BVH, so a ray that misses a group never reaches its triangles.
         g = Group()
-        g.objects.append(self.default_group)
-        for group in self.named_groups:
-            g.objects.append(group)
+        for group in [self.default_group, *self.named_groups.values()]:
+            if group.objects:
+                g.add_child(group)
+        g.build_bvh(leaf_size)
         return g
 
     def get_named_group(self, group_name):
@@ -57,3 +272,123 @@ class Parser:
 
     def create_named_group(self, group_name):
         self.named_groups[group_name] = Group()
+
+
+def _face_indices(tokens, vertex_count: int, normal_count: int):
+    # Each vertex is "v", "v/vt", "v//vn" or "v/vt/vn". Negative indices
+    # count back from the most recent vertex (or normal).
+    indices = []
+    normals = []
+    for token in tokens[1:]:
+        parts = token.split("/")
+        i = int(parts[0])
+        if i < 0:
+            i += vertex_count
+        if not 0 < i < vertex_count:
+            raise IndexError(f"vertex {parts[0]} out of range")
+        indices.append(i)
+        if len(parts) > 2 and parts[2]:
+            n = int(parts[2])
+            if n < 0:
+                n += normal_count
+            if not 0 < n < normal_count:
+                raise IndexError(f"normal {parts[2]} out of range")
+            normals.append(n)
+    if len(indices) < 3:
+        raise IndexError("face needs at least three vertices")
+    if len(normals) != len(indices):
+        normals = None
+    return (indices, normals)
+
+
+def _line_ranges(path: str, chunk_size: int):
+    ranges = []
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        start = 0
+        while start < size:
+            f.seek(start + chunk_size)
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((path, start, end))
+            start = end
+    return ranges
+
+
+def _read_lines(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return io.StringIO(data.decode(), newline=None)
+
+
+# The two passes of Parser.parse_file, run in worker processes on one byte
+# range each. Line numbers in their results count from the range's start.
+def _parse_vertex_chunk(chunk):
+    vertices = array("d")
+    normals = array("d")
+    textures = array("d")
+    errors = []
+    lines = 0
+    for line in _read_lines(*chunk):
+        lines += 1
+        tokens = line.split()
+        if not tokens:
+            continue
+        kind = tokens[0]
+        try:
+            if kind == "v":
+                vertices.extend((float(tokens[1]), float(tokens[2]), float(tokens[3])))
+            elif kind == "vn":
+                normals.extend((float(tokens[1]), float(tokens[2]), float(tokens[3])))
+            elif kind == "vt":
+                v = float(tokens[2]) if len(tokens) > 2 else 0.0
+                textures.extend((float(tokens[1]), v))
+        except (ValueError, IndexError):
+            errors.append((lines, line.rstrip("\r\n")))
+    return (lines, vertices, normals, textures, errors)
+
+
+def _parse_face_chunk(job):
+    # skip holds the vertex records the first pass couldn't read, which
+    # don't count towards the vertex indices.
+    path, start, end, vertex_count, normal_count, skip = job
+    head = (array("l"), array("l"))
+    faces, face_normals = head
+    groups = []
+    ignored = 0
+    errors = []
+    lineno = 0
+    for line in _read_lines(path, start, end):
+        lineno += 1
+        tokens = line.split()
+        if not tokens or tokens[0][0] == "#":
+            continue
+        kind = tokens[0]
+        if kind == "v":
+            vertex_count += lineno not in skip
+        elif kind == "vn":
+            normal_count += lineno not in skip
+        elif kind == "vt":
+            continue
+        elif kind == "f":
+            try:
+                indices, normals = _face_indices(tokens, vertex_count, normal_count)
+            except (ValueError, IndexError):
+                ignored += 1
+                errors.append((lineno, line.rstrip("\r\n")))
+                continue
+            first = indices[0]
+            for i in range(2, len(indices)):
+                faces.extend((first, indices[i - 1], indices[i]))
+                if normals is None:
+                    face_normals.extend((-1, -1, -1))
+                else:
+                    face_normals.extend((normals[0], normals[i - 1], normals[i]))
+        elif kind == "g":
+            faces = array("l")
+            face_normals = array("l")
+            groups.append((tokens[1] if len(tokens) > 1 else None, faces, face_normals))
+        else:
+            ignored += 1
+    return (head, groups, ignored, errors)
@@ -1,4 +1,4 @@
-from raytracer.base import Point, Color, Identity, Matrix
+from raytracer.base import Point, Color, Identity, Matrix, Affine
 import math
 
 
@@ -6,12 +6,34 @@ class Pattern:
     def __init__(self):
         self.transform = Identity()
 
+    @property
+    def transform(self) -> Matrix:
+        return self._transform
+
+    @transform.setter
+    def transform(self, t: Matrix):
+        self._transform = t
+        self._inverse = None
+
+    @property
+    def inverse(self) -> Matrix:
+        if self._inverse is None or self._inverse_version != self._transform.version:
+            self._inverse = self._transform.inverse()
+            self._inverse_affine = self._inverse.to_affine()
+            self._inverse_version = self._transform.version
+        return self._inverse
+
+    @property
+    def inverse_affine(self) -> Affine:
+        self.inverse
+        return self._inverse_affine
+
     def set_pattern_transform(self, t: Matrix):
         self.transform *= t
 
     def pattern_at_shape(self, shape, world_point: Point):
         object_point = shape.world_to_object(world_point)
-        pattern_point = self.transform.inverse() * object_point
+        pattern_point = self.inverse_affine.apply_point(object_point)
         return self.pattern_at(pattern_point)
 
     def pattern_at(self, point):
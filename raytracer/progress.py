@@ -0,0 +1,44 @@
+import math
+import sys
+import time
+
+
+class RenderProgress:
+    # Passed to a renderer's progress callback after every row, tile or
+    # batch of rows it finishes. done and total count those units (named by
+    # unit); rays counts the primary rays traced so far.
+    def __init__(self, callback, total: int, unit: str):
+        self.callback = callback
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.rays = 0
+        self.elapsed = 0.0
+        self._start = time.perf_counter()
+
+    def update(self, units: int, rays: int):
+        self.done += units
+        self.rays += rays
+        self.elapsed = time.perf_counter() - self._start
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def rays_per_second(self) -> float:
+        return self.rays / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float:
+        # Seconds left if the remaining units go as fast as the finished ones.
+        if self.done == 0:
+            return math.inf
+        return self.elapsed * (self.total - self.done) / self.done
+
+
+def print_progress(progress: RenderProgress, file=None):
+    # A ready-made callback: one line per update on stderr.
+    print(
+        f"{progress.done}/{progress.total} {progress.unit}s, "
+        f"{progress.rays_per_second:.0f} rays/s, ETA {progress.eta:.1f}s",
+        file=sys.stderr if file is None else file,
+    )
@@ -1,4 +1,4 @@
-from raytracer.base import Point, Vector, Matrix, EPSILON
+from raytracer.base import Point, Vector, Matrix, Affine, EPSILON
 from typing import NamedTuple, Any
 import math
 
@@ -12,26 +12,51 @@ class Ray:
         return self.origin + self.direction * time
 
     def transform(self, m: Matrix):
+        if isinstance(m, Affine):
+            return Ray(m.apply_point(self.origin), m.apply_vector(self.direction))
         return Ray(m * self.origin, m * self.direction)
 
 
 class Intersection:
-    def __init__(self, t: float, object: object):
+    def __init__(
+        self,
+        t: float,
+        object: object,
+        face: int = None,
+        u: float = None,
+        v: float = None,
+        instance: tuple = None,
+    ):
         self.t = t
         self.object = object
+        self.face = face
+        self.u = u
+        self.v = v
+        self.instance = instance
 
     def __lt__(self, other):
         return self.t < other.t
 
     def __eq__(self, other):
-        return self.t == other.t and self.object == other.object
+        return (
+            self.t == other.t
+            and self.object is other.object
+            and self.instance == other.instance
+        )
+
+    # The object to shade: the shape hit or, for a hit inside instances,
+    # that shape as they place it.
+    @property
+    def surface(self):
+        if self.instance is None:
+            return self.object
+        return self.instance[0].part(self)
 
     def prepare_computation(self, ray: Ray, xs=None):
-        if xs is None:
-            xs = Intersections(self)
+        surface = self.surface
         point = ray.position(self.t)
         eyev = -ray.direction
-        normalv = self.object.normal_at(point)
+        normalv = surface.normal_at(point, self)
         if normalv.dot(eyev) < 0:
             inside = True
             normalv = -normalv
@@ -41,29 +66,16 @@ class Intersection:
         over_point = point + (normalv * EPSILON)
         under_point = point - (normalv * EPSILON)
 
-        containers = []
-        for i in xs:
-            if i == self:
-                if len(containers) == 0:
-                    n1 = 1.0
-                else:
-                    n1 = containers[-1].material.refractive_index
-
-            if i.object in containers:
-                containers.remove(i.object)
-            else:
-                containers.append(i.object)
-
-            if i == self:
-                if len(containers) == 0:
-                    n2 = 1.0
-                else:
-                    n2 = containers[-1].material.refractive_index
-                break
+        if xs is None:
+            # A lone hit can't be inside anything else, so skip the walk.
+            n1 = 1.0
+            n2 = surface.material.refractive_index
+        else:
+            (n1, n2) = self.refractive_indices(xs)
 
         return Comps(
             self.t,
-            self.object,
+            surface,
             point,
             eyev,
             normalv,
@@ -75,6 +87,33 @@ class Intersection:
             n2,
         )
 
+    def refractive_indices(self, xs) -> (float, float):
+        # Containers live in a dict keyed by (instances, shape) for O(1)
+        # entering and leaving, plus a stack of entries in the order they were
+        # entered. Entries left since are dropped lazily when they reach the
+        # top, so the innermost container is found in amortised O(1) too.
+        containers = {}
+        stack = []
+        n1 = 1.0
+        for i in xs:
+            key = (i.instance, i.object)
+            is_hit = i is self or i == self
+            if is_hit and stack:
+                n1 = stack[-1][1]
+            if key in containers:
+                del containers[key]
+                while stack and containers.get(stack[-1][0]) is not stack[-1]:
+                    stack.pop()
+            else:
+                entry = (key, i.surface.material.refractive_index)
+                containers[key] = entry
+                stack.append(entry)
+            if is_hit:
+                if stack:
+                    return (n1, stack[-1][1])
+                return (n1, 1.0)
+        return (n1, 1.0)
+
     def __str__(self):
         return f"Intersection [time: {self.t}, object: {self.object}]"
 
@@ -1,14 +1,77 @@
 from raytracer.rays import Ray, Intersections, Intersection
-from raytracer.base import Point, Identity, Matrix, Vector, EPSILON
+from raytracer.base import Point, Identity, Matrix, Affine, Vector, EPSILON
 from raytracer.materials import Material
+from raytracer.bounds import BoundingBox
+from raytracer.bvh import BVH, LEAF_SIZE
+import itertools
 import math
 
 
 class Shape:
+    _ids = itertools.count()
+    # Transforms set and group contents changed on any Shape so far. Like
+    # Matrix.edits, it tells caches over many shapes when to look again.
+    moves = 0
+
     def __init__(self):
+        self.id = next(Shape._ids)
+        self.parent = None
         self.transform = Identity()
         self.material = Material()
-        self.parent = None
+
+    @property
+    def transform(self) -> Matrix:
+        return self._transform
+
+    @transform.setter
+    def transform(self, t: Matrix):
+        Shape.moves += 1
+        self._transform = t
+        self._inverse = None
+        self._invalidate_world()
+        if self.parent is not None:
+            self.parent._invalidate_bounds()
+
+    @property
+    def inverse(self) -> Matrix:
+        if self._inverse is None or self._inverse_version != self._transform.version:
+            self._inverse = self._transform.inverse()
+            self._inverse_transpose = self._inverse.transpose()
+            self._inverse_affine = self._inverse.to_affine()
+            self._inverse_version = self._transform.version
+            self._invalidate_world()
+        return self._inverse
+
+    @property
+    def inverse_transpose(self) -> Matrix:
+        self.inverse
+        return self._inverse_transpose
+
+    @property
+    def inverse_affine(self) -> Affine:
+        self.inverse
+        return self._inverse_affine
+
+    # The world-to-object transform composed through every ancestor. Its
+    # transpose takes object normals to world space, so one affine covers
+    # both directions. It is kept together with the parent's composite it
+    # was built from, and rebuilt when that (or this shape's own inverse)
+    # has changed, so edits anywhere up the chain are always seen.
+    @property
+    def world_inverse(self) -> Affine:
+        inverse = self.inverse
+        parent = None if self.parent is None else self.parent.world_inverse
+        if self._world_inverse is None or self._world_parent is not parent:
+            if parent is None:
+                self._world_inverse_matrix = inverse
+            else:
+                self._world_inverse_matrix = inverse * self.parent._world_inverse_matrix
+            self._world_inverse = self._world_inverse_matrix.to_affine()
+            self._world_parent = parent
+        return self._world_inverse
+
+    def _invalidate_world(self):
+        self._world_inverse = None
 
     def set_material(self, material: Material):
         self.material = material
@@ -16,42 +79,76 @@ class Shape:
     def set_transform(self, t: Matrix):
         self.transform *= t
 
+    # Shapes compare and hash by identity so they can be used as dict keys
+    # and in membership tests cheaply. Use equals() to compare by value.
     def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def equals(self, other) -> bool:
+        if self.parent is None or other.parent is None:
+            same_parent = self.parent is other.parent
+        else:
+            same_parent = self.parent.equals(other.parent)
         return (
             self.__class__ == other.__class__
             and self.material == other.material
-            and self.parent == other.parent
+            and same_parent
             and self.transform == other.transform
         )
 
-    def intersect(self, ray: Ray):
-        local_ray = ray.transform(self.transform.inverse())
-        return self.local_intersect(local_ray)
+    # Intersections are only reported for t_min < t < t_max. Affine
+    # transforms don't rescale t, so the interval carries into object space.
+    def intersect(self, ray: Ray, t_min: float = -math.inf, t_max: float = math.inf):
+        local_ray = ray.transform(self.inverse_affine)
+        return self.local_intersect(local_ray, t_min, t_max)
 
-    def normal_at(self, world_point: Point):
+    def hit(self, ray: Ray, t_min: float = 0, t_max: float = math.inf):
+        local_ray = ray.transform(self.inverse_affine)
+        return self.local_hit(local_ray, t_min, t_max)
+
+    def local_hit(self, ray: Ray, t_min: float, t_max: float):
+        hit = None
+        for i in self.local_intersect(ray, t_min, t_max):
+            if hit is None or i.t < hit.t:
+                hit = i
+        return hit
+
+    def any_hit(self, ray: Ray, max_distance: float) -> bool:
+        local_ray = ray.transform(self.inverse_affine)
+        return self.local_any_hit(local_ray, max_distance)
+
+    def local_any_hit(self, ray: Ray, max_distance: float) -> bool:
+        return len(self.local_intersect(ray, 0, max_distance)) > 0
+
+    def normal_at(self, world_point: Point, hit=None):
         local_point = self.world_to_object(world_point)
-        local_normal = self.local_normal_at(local_point)
+        local_normal = self.local_normal_at(local_point, hit)
         return self.normal_to_world(local_normal)
 
     def world_to_object(self, point: Point):
-        if self.parent is not None:
-            point = self.parent.world_to_object(point)
-        return self.transform.inverse() * point
+        return self.world_inverse.apply_point(point)
 
     def normal_to_world(self, normal: Vector):
-        normalv = self.transform.inverse().transpose() * normal
-        normalv.w = 0
-        normalv = normalv.normalize()
+        return self.world_inverse.apply_transpose(normal).normalize()
 
-        if self.parent is not None:
-            normalv = self.parent.normal_to_world(normalv)
+    def bounds(self) -> BoundingBox:
+        raise TypeError("Generic Shapes cannot be evaluated")
+
+    def parent_space_bounds(self) -> BoundingBox:
+        return self.bounds().transform(self.transform)
 
-        return normalv
+    # Changes whenever parent_space_bounds() may have, including after
+    # in-place edits to a transform. Groups use it to validate their bounds.
+    def _bounds_key(self):
+        return self.transform.version
 
-    def local_normal_at(self, local_point):
+    def local_normal_at(self, local_point, hit=None):
         raise TypeError("Generic Shapes cannot be evaluated")
 
-    def local_intersect(self, ray):
+    def local_intersect(self, ray, t_min=-math.inf, t_max=math.inf):
         raise TypeError("Generic Shapes cannot be evaluated")
 
     def __str__(self):
@@ -62,12 +159,16 @@ class _TestShape(Shape):
     def __init__(self):
         super().__init__()
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         self.saved_ray = ray
+        return Intersections()
 
-    def local_normal_at(self, point):
+    def local_normal_at(self, point, hit=None):
         return Vector(point.x, point.y, point.z)
 
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
 
 class Sphere(Shape):
     def __init__(self):
@@ -75,7 +176,7 @@ class Sphere(Shape):
         self.radius = 1
         super().__init__()
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         obj_to_ray = ray.origin - self.origin
         a = ray.direction.dot(ray.direction)
         b = 2 * ray.direction.dot(obj_to_ray)
@@ -87,18 +188,25 @@ class Sphere(Shape):
 
         t1 = (-b - math.sqrt(discriminant)) / (2 * a)
         t2 = (-b + math.sqrt(discriminant)) / (2 * a)
-        return Intersections(Intersection(t1, self), Intersection(t2, self))
+        xs = Intersections()
+        if t_min < t1 < t_max:
+            xs.append(Intersection(t1, self))
+        if t_min < t2 < t_max:
+            xs.append(Intersection(t2, self))
+        return xs
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         return point - self.origin
 
-    def __eq__(self, other):
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
+    def equals(self, other) -> bool:
         return (
             isinstance(other, Sphere)
             and self.origin == other.origin
             and self.radius == other.radius
-            and self.transform == other.transform
-            and self.material == other.material
+            and super().equals(other)
         )
 
 
@@ -113,15 +221,20 @@ class Plane(Shape):
     def __init__(self):
         super().__init__()
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         return Vector(0, 1, 0)
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         if abs(ray.direction.y) < EPSILON:
             return Intersections()
         t = -ray.origin.y / ray.direction.y
+        if not t_min < t < t_max:
+            return Intersections()
         return Intersections(Intersection(t, self))
 
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(Point(-math.inf, 0, -math.inf), Point(math.inf, 0, math.inf))
+
 
 # CUBE CHECK AXIS HELPER FUNCTION
 def check_axis(origin, direction) -> (float, float):
@@ -142,18 +255,22 @@ class Cube(Shape):
     def __init__(self):
         super().__init__()
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         xtmin, xtmax = check_axis(ray.origin.x, ray.direction.x)
         ytmin, ytmax = check_axis(ray.origin.y, ray.direction.y)
         ztmin, ztmax = check_axis(ray.origin.z, ray.direction.z)
         tmin = max(xtmin, ytmin, ztmin)
         tmax = min(xtmax, ytmax, ztmax)
-        if tmin > tmax:
+        if tmin > tmax or tmax <= t_min or tmin >= t_max:
             return Intersections()
-        else:
-            return Intersections(Intersection(tmin, self), Intersection(tmax, self))
+        xs = Intersections()
+        if tmin > t_min:
+            xs.append(Intersection(tmin, self))
+        if tmax < t_max:
+            xs.append(Intersection(tmax, self))
+        return xs
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         maxc = max(abs(point.x), abs(point.y), abs(point.z))
         if maxc == abs(point.x):
             return Vector(point.x, 0, 0)
@@ -162,6 +279,9 @@ class Cube(Shape):
         else:
             return Vector(0, 0, point.z)
 
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
 
 def check_cap(ray: Ray, t: float, radius: float) -> bool:
     x = ray.origin.x + t * ray.direction.x
@@ -176,11 +296,11 @@ class Cylinder(Shape):
         self.closed = False
         super().__init__()
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         a = ray.direction.x ** 2 + ray.direction.z ** 2
         if abs(a) < EPSILON:
             xs = Intersections()
-            self.intersect_caps(ray, xs)
+            self.intersect_caps(ray, xs, t_min, t_max)
             return xs
 
         b = 2 * ray.origin.x * ray.direction.x + 2 * ray.origin.z * ray.direction.z
@@ -198,17 +318,17 @@ class Cylinder(Shape):
         xs = Intersections()
 
         y0 = ray.origin.y + t0 * ray.direction.y
-        if self.minimum < y0 and y0 < self.maximum:
+        if self.minimum < y0 and y0 < self.maximum and t_min < t0 < t_max:
             xs.append(Intersection(t0, self))
 
         y1 = ray.origin.y + t1 * ray.direction.y
-        if self.minimum < y1 and y1 < self.maximum:
+        if self.minimum < y1 and y1 < self.maximum and t_min < t1 < t_max:
             xs.append(Intersection(t1, self))
 
-        self.intersect_caps(ray, xs)
+        self.intersect_caps(ray, xs, t_min, t_max)
         return xs
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         dist = point.x ** 2 + point.z ** 2
         if dist < 1 and point.y >= self.maximum - EPSILON:
             return Vector(0, 1, 0)
@@ -217,18 +337,23 @@ class Cylinder(Shape):
         else:
             return Vector(point.x, 0, point.z)
 
-    def intersect_caps(self, ray: Ray, xs):
+    def intersect_caps(
+        self, ray: Ray, xs, t_min: float = -math.inf, t_max: float = math.inf
+    ):
         if self.closed == False or abs(ray.direction.y) < EPSILON:
             return
 
         t_lower = (self.minimum - ray.origin.y) / ray.direction.y
-        if check_cap(ray, t_lower, 1):
+        if t_min < t_lower < t_max and check_cap(ray, t_lower, 1):
             xs.append(Intersection(t_lower, self))
 
         t_upper = (self.maximum - ray.origin.y) / ray.direction.y
-        if check_cap(ray, t_upper, 1):
+        if t_min < t_upper < t_max and check_cap(ray, t_upper, 1):
             xs.append(Intersection(t_upper, self))
 
+    def bounds(self) -> BoundingBox:
+        return BoundingBox(Point(-1, self.minimum, -1), Point(1, self.maximum, 1))
+
 
 class Cone(Shape):
     def __init__(self):
@@ -237,7 +362,7 @@ class Cone(Shape):
         self.closed = False
         super().__init__()
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         a = ray.direction.x ** 2 - ray.direction.y ** 2 + ray.direction.z ** 2
         b = (
             2 * ray.origin.x * ray.direction.x
@@ -250,8 +375,9 @@ class Cone(Shape):
             xs = Intersections()
             if abs(b) > EPSILON:
                 t = -c / (2 * b)
-                xs.append(Intersection(t, self))
-            self.intersect_caps(ray, xs)
+                if t_min < t < t_max:
+                    xs.append(Intersection(t, self))
+            self.intersect_caps(ray, xs, t_min, t_max)
             return xs
 
         disc = b ** 2 - 4 * a * c
@@ -267,29 +393,31 @@ class Cone(Shape):
         xs = Intersections()
 
         y0 = ray.origin.y + t0 * ray.direction.y
-        if self.minimum < y0 and y0 < self.maximum:
+        if self.minimum < y0 and y0 < self.maximum and t_min < t0 < t_max:
             xs.append(Intersection(t0, self))
 
         y1 = ray.origin.y + t1 * ray.direction.y
-        if self.minimum < y1 and y1 < self.maximum:
+        if self.minimum < y1 and y1 < self.maximum and t_min < t1 < t_max:
             xs.append(Intersection(t1, self))
 
-        self.intersect_caps(ray, xs)
+        self.intersect_caps(ray, xs, t_min, t_max)
         return xs
 
-    def intersect_caps(self, ray: Ray, xs):
+    def intersect_caps(
+        self, ray: Ray, xs, t_min: float = -math.inf, t_max: float = math.inf
+    ):
         if self.closed == False or abs(ray.direction.y) < EPSILON:
             return
 
         t_lower = (self.minimum - ray.origin.y) / ray.direction.y
-        if check_cap(ray, t_lower, self.minimum):
+        if t_min < t_lower < t_max and check_cap(ray, t_lower, self.minimum):
             xs.append(Intersection(t_lower, self))
 
         t_upper = (self.maximum - ray.origin.y) / ray.direction.y
-        if check_cap(ray, t_upper, self.maximum):
+        if t_min < t_upper < t_max and check_cap(ray, t_upper, self.maximum):
             xs.append(Intersection(t_upper, self))
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         dist = point.x ** 2 + point.z ** 2
         y = math.sqrt(dist)
         if point.y > 0:
@@ -301,26 +429,214 @@ class Cone(Shape):
         else:
             return Vector(point.x, y, point.z)
 
+    def bounds(self) -> BoundingBox:
+        limit = max(abs(self.minimum), abs(self.maximum))
+        return BoundingBox(
+            Point(-limit, self.minimum, -limit), Point(limit, self.maximum, limit)
+        )
+
 
 class Group(Shape):
     def __init__(self):
         self.objects = []
+        self.bvh = None
+        self._bvh_leaf_size = None
+        self._bounds = None
         super().__init__()
 
     def add_child(self, object):
         self.objects.append(object)
         object.parent = self
+        object._invalidate_world()
+        self._invalidate_bounds()
 
-    def local_intersect(self, ray: Ray):
-        total_xs = Intersections()
+    def _invalidate_world(self):
+        self._world_inverse = None
         for obj in self.objects:
-            xs = obj.intersect(ray)
-            total_xs.extend(xs)
+            obj._invalidate_world()
+
+    def flatten(self):
+        # Precompute the composite transforms of everything below this group,
+        # e.g. before handing the scene to worker processes.
+        self.world_inverse
+        for obj in self.objects:
+            if isinstance(obj, (Group, Instance)):
+                obj.flatten()
+            else:
+                obj.world_inverse
+
+    # Adding or moving a child (at any depth) drops this group's bounds and
+    # BVH. A BVH built once with build_bvh is then rebuilt on first use.
+    def _invalidate_bounds(self):
+        Shape.moves += 1
+        self._bounds = None
+        self.bvh = None
+        if self.parent is not None:
+            self.parent._invalidate_bounds()
+
+    def build_bvh(self, leaf_size: int = LEAF_SIZE):
+        for obj in self.objects:
+            if isinstance(obj, (Group, Instance)):
+                obj.build_bvh(leaf_size)
+        self._bounds = None
+        self._bvh_leaf_size = leaf_size
+        self.bvh = BVH(self.objects, leaf_size)
+        return self.bvh
+
+    def _current_bvh(self):
+        if self.bvh is None and self._bvh_leaf_size is not None:
+            self.bvh = BVH(self.objects, self._bvh_leaf_size)
+        return self.bvh
+
+    def bounds(self) -> BoundingBox:
+        if self._bounds is not None and self._bounds_edits != Matrix.edits:
+            # Some matrix was edited in place; see if it moved a child.
+            self._bounds_edits = Matrix.edits
+            if [obj._bounds_key() for obj in self.objects] != self._child_keys:
+                self._invalidate_bounds()
+        if self._bounds is None:
+            box = BoundingBox()
+            for obj in self.objects:
+                box.add_box(obj.parent_space_bounds())
+            self._bounds = box
+            self._bounds_edits = Matrix.edits
+            self._child_keys = [obj._bounds_key() for obj in self.objects]
+        return self._bounds
+
+    def _bounds_key(self):
+        return (self.transform.version, self.bounds())
+
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
+        if not self.bounds().intersects(ray, t_min, t_max):
+            return Intersections()
+        bvh = self._current_bvh()
+        if bvh is not None:
+            total_xs = bvh.intersect(ray, t_min, t_max)
+        else:
+            total_xs = Intersections()
+            for obj in self.objects:
+                xs = obj.intersect(ray, t_min, t_max)
+                total_xs.extend(xs)
         total_xs.sort()
-        for x in total_xs:
-            print(x)
         return total_xs
 
+    def local_hit(self, ray: Ray, t_min: float, t_max: float):
+        if not self.bounds().intersects(ray, t_min, t_max):
+            return None
+        bvh = self._current_bvh()
+        if bvh is not None:
+            return bvh.hit(ray, t_min, t_max)
+        hit = None
+        for obj in self.objects:
+            i = obj.hit(ray, t_min, t_max)
+            if i is not None:
+                hit = i
+                t_max = i.t
+        return hit
+
+    def local_any_hit(self, ray: Ray, max_distance: float) -> bool:
+        if not self.bounds().intersects(ray, 0, max_distance):
+            return False
+        bvh = self._current_bvh()
+        if bvh is not None:
+            return bvh.any_hit(ray, max_distance)
+        for obj in self.objects:
+            if obj.any_hit(ray, max_distance):
+                return True
+        return False
+
+
+class Instance(Shape):
+    # Places a shared prototype (a Group, mesh or any other shape that has no
+    # parent of its own) with this shape's transform, so many copies of it
+    # cost one set of triangles and one acceleration structure. A material
+    # set here overrides the prototype's; by default it is None and every
+    # part keeps its own.
+    def __init__(self, prototype: Shape, material: Material = None):
+        if prototype.parent is not None:
+            raise TypeError("Instance prototypes cannot have a parent")
+        super().__init__()
+        self.prototype = prototype
+        self.material = material
+
+    def build_bvh(self, leaf_size: int = LEAF_SIZE):
+        # Shared by every instance, so it is only built once.
+        if isinstance(self.prototype, Group) and self.prototype._bvh_leaf_size is None:
+            self.prototype.build_bvh(leaf_size)
+
+    def flatten(self):
+        self.world_inverse
+        if isinstance(self.prototype, Group):
+            self.prototype.flatten()
+        else:
+            self.prototype.world_inverse
+
+    def bounds(self) -> BoundingBox:
+        return self.prototype.parent_space_bounds()
+
+    def _bounds_key(self):
+        return (self.transform.version, self.bounds())
+
+    def part(self, hit) -> "InstancePart":
+        return InstancePart(hit.instance, hit.object)
+
+    # Hits keep the prototype shape as their object and record the instances
+    # they went through, outermost first, as nested (instance, inner) pairs.
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
+        xs = self.prototype.intersect(ray, t_min, t_max)
+        for i in xs:
+            i.instance = (self, i.instance)
+        return xs
+
+    def local_hit(self, ray: Ray, t_min: float, t_max: float):
+        hit = self.prototype.hit(ray, t_min, t_max)
+        if hit is not None:
+            hit.instance = (self, hit.instance)
+        return hit
+
+    def local_any_hit(self, ray: Ray, max_distance: float) -> bool:
+        return self.prototype.any_hit(ray, max_distance)
+
+    def equals(self, other) -> bool:
+        return super().equals(other) and self.prototype is other.prototype
+
+
+class InstancePart:
+    # What a hit inside instances is shaded as: the prototype shape placed by
+    # each instance in the chain. Made per hit when it is shaded, so nothing
+    # is kept per instance and shape.
+    def __init__(self, chain, shape):
+        self.instances = []
+        while chain is not None:
+            instance, chain = chain
+            self.instances.append(instance)
+        self.shape = shape
+
+    @property
+    def instance(self) -> Instance:
+        return self.instances[0]
+
+    @property
+    def material(self) -> Material:
+        for instance in self.instances:
+            if instance.material is not None:
+                return instance.material
+        return self.shape.material
+
+    def world_to_object(self, point: Point):
+        for instance in self.instances:
+            point = instance.world_to_object(point)
+        return self.shape.world_to_object(point)
+
+    def normal_at(self, world_point: Point, hit=None):
+        point = world_point
+        for instance in self.instances:
+            point = instance.world_to_object(point)
+        normal = self.shape.normal_at(point, hit)
+        for instance in reversed(self.instances):
+            normal = instance.normal_to_world(normal)
+        return normal
+
 
 class Triangle(Shape):
     def __init__(self, p1: Point, p2: Point, p3: Point):
@@ -332,10 +648,10 @@ class Triangle(Shape):
         self.normal = self.e2.cross(self.e1).normalize()
         super().__init__()
 
-    def local_normal_at(self, point: Point):
+    def local_normal_at(self, point: Point, hit=None):
         return self.normal
 
-    def local_intersect(self, ray: Ray):
+    def local_intersect(self, ray: Ray, t_min=-math.inf, t_max=math.inf):
         dir_cross_e2 = ray.direction.cross(self.e2)
         det = self.e1.dot(dir_cross_e2)
         if abs(det) < EPSILON:
@@ -353,7 +669,37 @@ class Triangle(Shape):
             return Intersections()
 
         t = f * self.e2.dot(origin_cross_e1)
-        return Intersections(Intersection(t, self))  # BOGUS TO TEST AGAINST POSITIVE
+        if not t_min < t < t_max:
+            return Intersections()
+        return Intersections(Intersection(t, self, u=u, v=v))
+
+    def bounds(self) -> BoundingBox:
+        box = BoundingBox()
+        box.add_point(self.p1)
+        box.add_point(self.p2)
+        box.add_point(self.p3)
+        return box
 
     def __str__(self):
         return f"Triangle: p1: {self.p1}, p2: {self.p2}, p3: {self.p3}"
+
+
+class SmoothTriangle(Triangle):
+    def __init__(
+        self, p1: Point, p2: Point, p3: Point, n1: Vector, n2: Vector, n3: Vector
+    ):
+        self.n1 = n1
+        self.n2 = n2
+        self.n3 = n3
+        super().__init__(p1, p2, p3)
+
+    def local_normal_at(self, point: Point, hit=None):
+        if hit is None or hit.u is None:
+            return self.normal
+        return self.n2 * hit.u + self.n3 * hit.v + self.n1 * (1 - hit.u - hit.v)
+
+    def __str__(self):
+        return (
+            f"SmoothTriangle: p1: {self.p1}, p2: {self.p2}, p3: {self.p3}, "
+            f"n1: {self.n1}, n2: {self.n2}, n3: {self.n3}"
+        )
@@ -0,0 +1,523 @@
+from raytracer.base import Canvas, Point, Vector, EPSILON, FLOAT32_TINY
+from raytracer.shapes import Sphere, GlassSphere, Plane, Cube, Cylinder, Cone, Triangle
+from raytracer.patterns import (
+    StripePattern,
+    GradientPattern,
+    RingPattern,
+    CheckersPattern,
+    _TestPattern,
+)
+from raytracer.rays import Ray
+from raytracer.world import MAXBOUNCE
+from raytracer.progress import RenderProgress
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rays traced together per batch. Bounds the size of the temporary arrays.
+BATCH_SIZE = 65536
+
+
+# Rendering a frame "wavefront" style: every primary ray of a batch is held
+# in NumPy arrays and intersected against one shape at a time, then all hit
+# points are shaded together. Shadow and reflection rays are traced the same
+# way. Anything the kernels below don't cover (groups, transparent
+# materials, custom patterns) falls back to the scalar World methods for
+# just those pixels, so the image matches Camera.render.
+def render_wavefront(
+    camera, world, batch_size: int = BATCH_SIZE, progress=None
+) -> Canvas:
+    if np is None:
+        raise ImportError("The wavefront renderer requires NumPy")
+    image = Canvas(camera.hsize, camera.vsize)
+    rows_per_batch = max(1, batch_size // camera.hsize)
+    stats = RenderProgress(progress, camera.vsize, "row")
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for y0 in range(0, camera.vsize, rows_per_batch):
+            y1 = min(camera.vsize, y0 + rows_per_batch)
+            origins, directions = primary_rays(camera, y0, y1)
+            colors = _trace(world, origins, directions, MAXBOUNCE)
+            colors[(colors > 0) & (colors < FLOAT32_TINY)] = FLOAT32_TINY
+            image.write_span(0, y0, array("f", colors.astype(np.float32).tobytes()))
+            stats.update(y1 - y0, len(colors))
+    return image
+
+
+def primary_rays(camera, y0: int, y1: int):
+    xs = np.arange(camera.hsize, dtype=float)
+    ys = np.arange(y0, y1, dtype=float)
+    px, py = np.meshgrid(xs, ys)
+    world_x = camera.half_width - (px.ravel() + 0.5) * camera.pixel_size
+    world_y = camera.half_height - (py.ravel() + 0.5) * camera.pixel_size
+    inv = _array(camera.inverse)
+    pixels = np.stack([world_x, world_y, -np.ones_like(world_x)], axis=1)
+    pixels = pixels @ inv[:3, :3].T + inv[:3, 3]
+    origin = inv[:3, 3]
+    directions = _normalize(pixels - origin)
+    origins = np.broadcast_to(origin, directions.shape).copy()
+    return origins, directions
+
+
+def _array(m):
+    return np.array([list(row) for row in m.matrix], dtype=float)
+
+
+def _normalize(v):
+    return v / np.sqrt((v * v).sum(axis=1))[:, None]
+
+
+def _dot(a, b):
+    return (a * b).sum(axis=1)
+
+
+def _rgb(c):
+    return np.array([c.red, c.green, c.blue], dtype=float)
+
+
+def _ray(origins, directions, index):
+    o = origins[index].tolist()
+    d = directions[index].tolist()
+    return Ray(Point(*o), Vector(*d))
+
+
+# Intersection kernels. Each takes object-space origins and directions and
+# returns a list of t arrays, one per potential root, with np.inf where that
+# root doesn't exist. They mirror the scalar local_intersect methods.
+def _sphere_roots(shape, o, d):
+    oc = o - np.array([shape.origin.x, shape.origin.y, shape.origin.z])
+    a = _dot(d, d)
+    b = 2 * _dot(d, oc)
+    c = _dot(oc, oc) - 1
+    disc = b * b - 4 * a * c
+    hit = disc >= 0
+    root = np.sqrt(np.where(hit, disc, 0))
+    t1 = np.where(hit, (-b - root) / (2 * a), np.inf)
+    t2 = np.where(hit, (-b + root) / (2 * a), np.inf)
+    return [t1, t2]
+
+
+def _plane_roots(shape, o, d):
+    hit = np.abs(d[:, 1]) >= EPSILON
+    return [np.where(hit, -o[:, 1] / d[:, 1], np.inf)]
+
+
+def _cube_roots(shape, o, d):
+    tmin = np.full(len(o), -np.inf)
+    tmax = np.full(len(o), np.inf)
+    for axis in range(3):
+        origin = o[:, axis]
+        direction = d[:, axis]
+        small = np.abs(direction) < EPSILON
+        t0 = np.where(small, (-1 - origin) * np.inf, (-1 - origin) / direction)
+        t1 = np.where(small, (1 - origin) * np.inf, (1 - origin) / direction)
+        tmin = np.maximum(tmin, np.minimum(t0, t1))
+        tmax = np.minimum(tmax, np.maximum(t0, t1))
+    hit = ~(tmin > tmax)
+    return [np.where(hit, tmin, np.inf), np.where(hit, tmax, np.inf)]
+
+
+def _caps(shape, o, d, allowed, lower_radius, upper_radius):
+    roots = []
+    if not shape.closed:
+        return roots
+    allowed = allowed & (np.abs(d[:, 1]) >= EPSILON)
+    for limit, radius in ((shape.minimum, lower_radius), (shape.maximum, upper_radius)):
+        t = (limit - o[:, 1]) / d[:, 1]
+        x = o[:, 0] + t * d[:, 0]
+        z = o[:, 2] + t * d[:, 2]
+        roots.append(np.where(allowed & ((x * x + z * z) <= abs(radius)), t, np.inf))
+    return roots
+
+
+def _walls(shape, o, d, a, b, c, body):
+    disc = b * b - 4 * a * c
+    body = body & (disc >= 0)
+    root = np.sqrt(np.where(body, disc, 0))
+    t0 = (-b - root) / (2 * a)
+    t1 = (-b + root) / (2 * a)
+    t0, t1 = np.minimum(t0, t1), np.maximum(t0, t1)
+    roots = []
+    for t in (t0, t1):
+        y = o[:, 1] + t * d[:, 1]
+        inside = body & (shape.minimum < y) & (y < shape.maximum)
+        roots.append(np.where(inside, t, np.inf))
+    return roots, disc
+
+
+def _cylinder_roots(shape, o, d):
+    a = d[:, 0] ** 2 + d[:, 2] ** 2
+    b = 2 * o[:, 0] * d[:, 0] + 2 * o[:, 2] * d[:, 2]
+    c = o[:, 0] ** 2 + o[:, 2] ** 2 - 1
+    small = np.abs(a) < EPSILON
+    roots, disc = _walls(shape, o, d, a, b, c, ~small)
+    return roots + _caps(shape, o, d, small | (disc >= 0), 1, 1)
+
+
+def _cone_roots(shape, o, d):
+    a = d[:, 0] ** 2 - d[:, 1] ** 2 + d[:, 2] ** 2
+    b = 2 * o[:, 0] * d[:, 0] - 2 * o[:, 1] * d[:, 1] + 2 * o[:, 2] * d[:, 2]
+    c = o[:, 0] ** 2 - o[:, 1] ** 2 + o[:, 2] ** 2
+    small = np.abs(a) < EPSILON
+    single = small & (np.abs(b) > EPSILON)
+    roots, disc = _walls(shape, o, d, a, b, c, ~small)
+    roots.append(np.where(single, -c / (2 * b), np.inf))
+    return roots + _caps(shape, o, d, small | (disc >= 0), shape.minimum, shape.maximum)
+
+
+def _triangle_roots(shape, o, d):
+    e1 = np.array([shape.e1.x, shape.e1.y, shape.e1.z])
+    e2 = np.array([shape.e2.x, shape.e2.y, shape.e2.z])
+    p1 = np.array([shape.p1.x, shape.p1.y, shape.p1.z])
+    dir_cross_e2 = np.cross(d, e2)
+    det = dir_cross_e2 @ e1
+    f = 1.0 / det
+    p1_to_origin = o - p1
+    u = f * _dot(p1_to_origin, dir_cross_e2)
+    origin_cross_e1 = np.cross(p1_to_origin, e1)
+    v = f * _dot(d, origin_cross_e1)
+    t = f * (origin_cross_e1 @ e2)
+    hit = (np.abs(det) >= EPSILON) & (u >= 0) & (u <= 1) & (v >= 0) & (u + v <= 1)
+    return [np.where(hit, t, np.inf)]
+
+
+# Object-space normal kernels, mirroring local_normal_at.
+def _sphere_normals(shape, p):
+    return p - np.array([shape.origin.x, shape.origin.y, shape.origin.z])
+
+
+def _plane_normals(shape, p):
+    n = np.zeros_like(p)
+    n[:, 1] = 1
+    return n
+
+
+def _cube_normals(shape, p):
+    a = np.abs(p)
+    maxc = a.max(axis=1)
+    n = np.zeros_like(p)
+    on_x = maxc == a[:, 0]
+    on_y = ~on_x & (maxc == a[:, 1])
+    on_z = ~on_x & ~on_y
+    n[on_x, 0] = p[on_x, 0]
+    n[on_y, 1] = p[on_y, 1]
+    n[on_z, 2] = p[on_z, 2]
+    return n
+
+
+def _capped_normals(shape, p, wall_y):
+    dist = p[:, 0] ** 2 + p[:, 2] ** 2
+    top = (dist < 1) & (p[:, 1] >= shape.maximum - EPSILON)
+    bottom = (dist < 1) & ~top & (p[:, 1] <= shape.minimum + EPSILON)
+    n = np.stack([p[:, 0], wall_y, p[:, 2]], axis=1)
+    n[top] = (0, 1, 0)
+    n[bottom] = (0, -1, 0)
+    return n
+
+
+def _cylinder_normals(shape, p):
+    return _capped_normals(shape, p, np.zeros(len(p)))
+
+
+def _cone_normals(shape, p):
+    y = np.sqrt(p[:, 0] ** 2 + p[:, 2] ** 2)
+    y = np.where(p[:, 1] > 0, -y, y)
+    return _capped_normals(shape, p, y)
+
+
+def _triangle_normals(shape, p):
+    return np.broadcast_to(
+        np.array([shape.normal.x, shape.normal.y, shape.normal.z]), p.shape
+    ).copy()
+
+
+# Exact types only: a subclass may override local_intersect.
+KERNELS = {
+    Sphere: (_sphere_roots, _sphere_normals),
+    GlassSphere: (_sphere_roots, _sphere_normals),
+    Plane: (_plane_roots, _plane_normals),
+    Cube: (_cube_roots, _cube_normals),
+    Cylinder: (_cylinder_roots, _cylinder_normals),
+    Cone: (_cone_roots, _cone_normals),
+    Triangle: (_triangle_roots, _triangle_normals),
+}
+
+
+def _kernels(shape):
+    if shape.parent is not None:
+        return None
+    return KERNELS.get(type(shape))
+
+
+def _object_space(shape, origins, directions):
+    inv = _array(shape.inverse)
+    lin = inv[:3, :3]
+    return origins @ lin.T + inv[:3, 3], directions @ lin.T
+
+
+def _box_mask(shape, origins, directions):
+    box = shape.parent_space_bounds()
+    if box.is_empty():
+        return np.zeros(len(origins), dtype=bool)
+    tmin = np.full(len(origins), -np.inf)
+    tmax = np.full(len(origins), np.inf)
+    inside = np.ones(len(origins), dtype=bool)
+    for axis, lo, hi in (
+        (0, box.min.x, box.max.x),
+        (1, box.min.y, box.max.y),
+        (2, box.min.z, box.max.z),
+    ):
+        origin = origins[:, axis]
+        direction = directions[:, axis]
+        parallel = direction == 0
+        inside &= ~(parallel & ((origin < lo) | (origin > hi)))
+        t0 = np.where(parallel, -np.inf, (lo - origin) / direction)
+        t1 = np.where(parallel, np.inf, (hi - origin) / direction)
+        tmin = np.maximum(tmin, np.minimum(t0, t1))
+        tmax = np.minimum(tmax, np.maximum(t0, t1))
+    return inside & (tmin <= tmax)
+
+
+def _nearest(world, origins, directions):
+    count = len(origins)
+    best_t = np.full(count, np.inf)
+    best_obj = np.full(count, -1)
+    # Hits on shapes without a kernel are only recorded as "somewhere along
+    # this ray"; those pixels are shaded by the scalar path.
+    for index, shape in enumerate(world.objects):
+        kernels = _kernels(shape)
+        if kernels is not None:
+            o, d = _object_space(shape, origins, directions)
+            for t in kernels[0](shape, o, d):
+                closer = (t > 0) & (t < best_t)
+                best_t = np.where(closer, t, best_t)
+                best_obj = np.where(closer, index, best_obj)
+        else:
+            for i in np.nonzero(_box_mask(shape, origins, directions))[0]:
+                hit = shape.intersect(_ray(origins, directions, i)).hit()
+                if hit is not None and hit.t < best_t[i]:
+                    best_t[i] = hit.t
+                    best_obj[i] = index
+    return best_t, best_obj
+
+
+def _occluded(world, origins, directions, distances):
+    shadowed = np.zeros(len(origins), dtype=bool)
+    for shape in world.objects:
+        kernels = _kernels(shape)
+        if kernels is not None:
+            o, d = _object_space(shape, origins, directions)
+            for t in kernels[0](shape, o, d):
+                shadowed |= (t > 0) & (t < distances)
+        else:
+            mask = _box_mask(shape, origins, directions) & ~shadowed
+            for i in np.nonzero(mask)[0]:
+                hit = shape.intersect(_ray(origins, directions, i)).hit()
+                if hit is not None and hit.t < distances[i]:
+                    shadowed[i] = True
+    return shadowed
+
+
+def _pattern_colors(pattern, shape, points):
+    if type(pattern) not in (
+        StripePattern,
+        GradientPattern,
+        RingPattern,
+        CheckersPattern,
+        _TestPattern,
+    ):
+        return None
+    o, _ = _object_space(shape, points, points)
+    inv = _array(pattern.inverse)
+    p = o @ inv[:3, :3].T + inv[:3, 3]
+    if isinstance(pattern, _TestPattern):
+        return p
+    a = _rgb(pattern.a)
+    b = _rgb(pattern.b)
+    if isinstance(pattern, GradientPattern):
+        fraction = p[:, 0] - np.floor(p[:, 0])
+        return a + (b - a) * fraction[:, None]
+    if isinstance(pattern, StripePattern):
+        even = np.mod(np.floor(p[:, 0]), 2) == 0
+    elif isinstance(pattern, RingPattern):
+        even = np.mod(np.floor(np.sqrt(p[:, 0] ** 2 + p[:, 2] ** 2)), 2) == 0
+    else:
+        even = np.mod(np.floor(p).sum(axis=1), 2) == 0
+    return np.where(even[:, None], a, b)
+
+
+def _refractive_indices(world, origins, directions, best_t, best_obj):
+    # Same answer as the containers walk in prepare_computation: a shape is
+    # "containing" the hit when the ray crossed it an odd number of times
+    # before the hit, and the innermost container is the one entered last.
+    count = len(origins)
+    crossings = np.zeros((len(world.objects), count), dtype=int)
+    entered = np.full((len(world.objects), count), -np.inf)
+    for index, shape in enumerate(world.objects):
+        o, d = _object_space(shape, origins, directions)
+        for t in _kernels(shape)[0](shape, o, d):
+            before = np.isfinite(t) & (t < best_t)
+            crossings[index] += before
+            entered[index] = np.where(
+                before, np.maximum(entered[index], t), entered[index]
+            )
+    indices = np.array([shape.material.refractive_index for shape in world.objects])
+    rows = np.arange(count)
+    inside = crossings % 2 == 1
+    latest = np.where(inside, entered, -np.inf)
+    n1 = np.where(inside.any(axis=0), indices[latest.argmax(axis=0)], 1.0)
+    leaving = inside[best_obj, rows]
+    latest[best_obj, rows] = np.where(leaving, -np.inf, np.inf)
+    still_inside = np.isfinite(latest).any(axis=0) | ~leaving
+    n2 = np.where(still_inside, indices[latest.argmax(axis=0)], 1.0)
+    return n1, n2
+
+
+def _schlick(eye, normal, n1, n2):
+    cos = _dot(eye, normal)
+    n = n1 / n2
+    sin2_t = n * n * (1.0 - cos * cos)
+    cos = np.where(n1 > n2, np.sqrt(np.maximum(1.0 - sin2_t, 0)), cos)
+    r0 = ((n1 - n2) / (n1 + n2)) ** 2
+    reflectance = r0 + (1 - r0) * ((1 - cos) ** 5)
+    return np.where((n1 > n2) & (sin2_t > 1.0), 1.0, reflectance)
+
+
+def _trace(world, origins, directions, remaining: int):
+    count = len(origins)
+    colors = np.zeros((count, 3))
+    if count == 0:
+        return colors
+    best_t, best_obj = _nearest(world, origins, directions)
+    all_kernels = all(_kernels(shape) is not None for shape in world.objects)
+
+    points = origins + directions * best_t[:, None]
+    normals = np.zeros((count, 3))
+    base = np.zeros((count, 3))
+    params = np.zeros((count, 7))
+    scalar = np.zeros(count, dtype=bool)
+    for index in np.unique(best_obj[best_obj >= 0]):
+        shape = world.objects[index]
+        mask = best_obj == index
+        kernels = _kernels(shape)
+        material = shape.material
+        # Refraction needs every crossing along the ray, which only the
+        # kernels can report in bulk.
+        if kernels is None or (material.transparency > 0 and not all_kernels):
+            scalar |= mask
+            continue
+        inv = _array(shape.inverse)
+        lin = inv[:3, :3]
+        local = points[mask] @ lin.T + inv[:3, 3]
+        normals[mask] = _normalize(kernels[1](shape, local) @ lin)
+        params[mask] = (
+            material.ambient,
+            material.diffuse,
+            material.specular,
+            material.shininess,
+            material.reflective,
+            material.transparency,
+            material.refractive_index,
+        )
+
+    eyev = -directions
+    flip = _dot(normals, eyev) < 0
+    normals[flip] = -normals[flip]
+    over_points = points + normals * EPSILON
+
+    for index in np.unique(best_obj[best_obj >= 0]):
+        shape = world.objects[index]
+        mask = (best_obj == index) & ~scalar
+        if not mask.any():
+            continue
+        if shape.material.pattern is None:
+            base[mask] = _rgb(shape.material.color)
+            continue
+        pattern_colors = _pattern_colors(
+            shape.material.pattern, shape, over_points[mask]
+        )
+        if pattern_colors is None:
+            scalar |= mask
+        else:
+            base[mask] = pattern_colors
+
+    for i in np.nonzero(scalar)[0]:
+        c = world.color_at(_ray(origins, directions, i), remaining)
+        colors[i] = (c.red, c.green, c.blue)
+
+    shade = (best_obj >= 0) & ~scalar
+    if not shade.any():
+        return colors
+    point = over_points[shade]
+    normalv = normals[shade]
+    eye = eyev[shade]
+    ambient, diffuse, specular, shininess, reflective, transparency, _ = params[shade].T
+
+    light = world.light
+    intensity = _rgb(light.intensity)
+    to_light = np.array([light.position.x, light.position.y, light.position.z]) - point
+    distance = np.sqrt(_dot(to_light, to_light))
+    lightv = to_light / distance[:, None]
+    shadowed = _occluded(world, point, lightv, distance)
+
+    effective = base[shade] * intensity
+    result = effective * ambient[:, None]
+    light_dot_normal = _dot(lightv, normalv)
+    lit = ~shadowed & (light_dot_normal >= 0)
+    result += np.where(
+        lit[:, None], effective * (diffuse * light_dot_normal)[:, None], 0
+    )
+    reflect_dot_eye = -_dot(lightv - normalv * (2 * light_dot_normal)[:, None], eye)
+    glint = lit & (reflect_dot_eye > 0)
+    factor = np.where(
+        glint, np.power(np.where(glint, reflect_dot_eye, 1), shininess), 0
+    )
+    result += intensity * (specular * factor)[:, None]
+    if remaining < 1:
+        colors[shade] = result
+        return colors
+
+    reflected = np.zeros_like(result)
+    bounce = reflective > 0
+    if bounce.any():
+        d = directions[shade][bounce]
+        n = normalv[bounce]
+        reflectv = d - n * (2 * _dot(d, n))[:, None]
+        reflected[bounce] = _trace(world, point[bounce], reflectv, remaining - 1)
+        reflected[bounce] *= reflective[bounce][:, None]
+
+    refracted = np.zeros_like(result)
+    clear = transparency > 0
+    if clear.any():
+        n1 = np.ones(len(result))
+        n2 = np.ones(len(result))
+        n1[clear], n2[clear] = _refractive_indices(
+            world,
+            origins[shade][clear],
+            directions[shade][clear],
+            best_t[shade][clear],
+            best_obj[shade][clear],
+        )
+        n_ratio = n1 / n2
+        cos_i = _dot(eye, normalv)
+        sin2_t = n_ratio**2 * (1 - cos_i**2)
+        passes = clear & (sin2_t <= 1)
+        if passes.any():
+            cos_t = np.sqrt(1.0 - sin2_t[passes])
+            direction = (
+                normalv[passes] * (n_ratio[passes] * cos_i[passes] - cos_t)[:, None]
+                - eye[passes] * n_ratio[passes][:, None]
+            )
+            under = points[shade][passes] - normalv[passes] * EPSILON
+            refracted[passes] = _trace(world, under, direction, remaining - 1)
+            refracted[passes] *= transparency[passes][:, None]
+        fresnel = clear & bounce
+        if fresnel.any():
+            r = _schlick(eye[fresnel], normalv[fresnel], n1[fresnel], n2[fresnel])
+            reflected[fresnel] *= r[:, None]
+            refracted[fresnel] *= (1 - r)[:, None]
+
+    colors[shade] = result + reflected + refracted
+    return colors
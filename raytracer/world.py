@@ -1,8 +1,9 @@
-from raytracer.base import Point, Color, Scaling
-from raytracer.shapes import Sphere
+from raytracer.base import Point, Color, Scaling, Matrix
+from raytracer.shapes import Shape, Sphere, Group, Instance
 from raytracer.lights import PointLight
 from raytracer.materials import Material
 from raytracer.rays import Ray, Intersections
+from raytracer.bvh import BVH, LEAF_SIZE
 
 import math
 
@@ -13,6 +14,7 @@ class World:
     def __init__(self):
         self.light = None
         self.objects = []
+        self.bvh = None
 
     @classmethod
     def default(cls):
@@ -29,13 +31,58 @@ class World:
         world.objects.extend([s1, s2])
         return world
 
-    def intersect(self, ray):
-        xs = Intersections()
+    # The BVH is rebuilt on first use after a top-level object (or anything
+    # inside one) has moved. Call build_bvh again after adding or removing
+    # objects.
+    def build_bvh(self, leaf_size: int = LEAF_SIZE):
         for obj in self.objects:
-            xs.extend(obj.intersect(ray))
+            if isinstance(obj, (Group, Instance)):
+                obj.build_bvh(leaf_size)
+        self.bvh = BVH(self.objects, leaf_size)
+        self._bvh_edits = Matrix.edits
+        self._bvh_moves = Shape.moves
+        self._bvh_keys = self._object_keys()
+        return self.bvh
+
+    def _object_keys(self):
+        return [(obj.transform, obj._bounds_key()) for obj in self.objects]
+
+    def _current_bvh(self):
+        if self.bvh is not None and (
+            self._bvh_edits != Matrix.edits or self._bvh_moves != Shape.moves
+        ):
+            # Something moved somewhere; rebuild if it changed any object's box.
+            self._bvh_edits = Matrix.edits
+            self._bvh_moves = Shape.moves
+            keys = self._object_keys()
+            if keys != self._bvh_keys:
+                self._bvh_keys = keys
+                self.bvh = BVH(self.objects, self.bvh.leaf_size)
+        return self.bvh
+
+    def intersect(self, ray, t_min: float = -math.inf, t_max: float = math.inf):
+        bvh = self._current_bvh()
+        if bvh is not None:
+            xs = bvh.intersect(ray, t_min, t_max)
+        else:
+            xs = Intersections()
+            for obj in self.objects:
+                xs.extend(obj.intersect(ray, t_min, t_max))
         xs.sort()
         return xs
 
+    def hit(self, ray, t_min: float = 0, t_max: float = math.inf):
+        bvh = self._current_bvh()
+        if bvh is not None:
+            return bvh.hit(ray, t_min, t_max)
+        hit = None
+        for obj in self.objects:
+            i = obj.hit(ray, t_min, t_max)
+            if i is not None:
+                hit = i
+                t_max = i.t
+        return hit
+
     def shade_hit(self, comps, remaining: int = MAXBOUNCE) -> Color:
         shadowed = self.is_shadowed(comps.over_point)
         surface = comps.object.material.lighting(
@@ -57,12 +104,15 @@ class World:
             return surface + reflected + refracted
 
     def color_at(self, ray: Ray, remaining: int = MAXBOUNCE) -> Color:
-        xs = self.intersect(ray)
-        hit = xs.hit()
+        hit = self.hit(ray)
         if hit is None:
             return Color(0, 0, 0)
-        else:
-            return self.shade_hit(hit.prepare_computation(ray, xs), remaining)
+        # n1/n2 only matter when refracting, and they need every crossing
+        # along the ray (including those behind the origin).
+        xs = None
+        if hit.surface.material.transparency > 0:
+            xs = self.intersect(ray)
+        return self.shade_hit(hit.prepare_computation(ray, xs), remaining)
 
     def reflected_color(self, comps, remaining: int = MAXBOUNCE) -> Color:
         if remaining < 1:
@@ -94,15 +144,17 @@ class World:
         )
         return color
 
+    def is_occluded(self, ray: Ray, max_distance: float) -> bool:
+        bvh = self._current_bvh()
+        if bvh is not None:
+            return bvh.any_hit(ray, max_distance)
+        for obj in self.objects:
+            if obj.any_hit(ray, max_distance):
+                return True
+        return False
+
     def is_shadowed(self, point: Point) -> bool:
         v = self.light.position - point
         distance = v.magnitude()
-        direction = v.normalize()
-
-        r = Ray(point, direction)
-        xs = self.intersect(r)
-        h = xs.hit()
-        if h is not None and h.t < distance:
-            return True
-        else:
-            return False
+        direction = v / distance
+        return self.is_occluded(Ray(point, direction), distance)
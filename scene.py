@@ -58,4 +58,4 @@ camera.transform = ViewTransform(Point(0, 1.5, -5), Point(0, 1, 0), Vector(0, 1,
 
 canvas = camera.render(world)
 with open("pattern.ppm", "w") as f:
-    f.write(canvas.to_ppm())
+    canvas.write_ppm(f)
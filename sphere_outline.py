@@ -42,4 +42,4 @@ for y in range(CANVAS_PIXELS):
 
 
 with open("sphere.ppm", "w") as f:
-    f.write(c.to_ppm())
+    c.write_ppm(f)
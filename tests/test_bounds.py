@@ -0,0 +1,154 @@
+from raytracer.bounds import BoundingBox
+from raytracer.shapes import Sphere, Plane, Cube, Cylinder, Cone, Triangle, Group
+from raytracer.base import Point, Vector, Translation, Scaling, RotationX, RotationY
+from raytracer.rays import Ray
+from raytracer.mesh import TriangleMesh
+import math
+
+
+def test_empty_box():
+    box = BoundingBox()
+    assert box.is_empty()
+    assert box.min.x == math.inf and box.max.x == -math.inf
+
+
+def test_add_points():
+    box = BoundingBox()
+    box.add_point(Point(-5, 2, 0))
+    box.add_point(Point(7, 0, -3))
+    assert box.min == Point(-5, 0, -3)
+    assert box.max == Point(7, 2, 0)
+
+
+def test_add_box():
+    box = BoundingBox(Point(-5, -2, 0), Point(7, 4, 4))
+    box.add_box(BoundingBox(Point(8, -7, -2), Point(14, 2, 8)))
+    assert box.min == Point(-5, -7, -2)
+    assert box.max == Point(14, 4, 8)
+
+
+def test_contains_point():
+    box = BoundingBox(Point(5, -2, 0), Point(11, 4, 7))
+    assert box.contains_point(Point(5, -2, 0))
+    assert box.contains_point(Point(8, 1, 3))
+    assert not box.contains_point(Point(3, 0, 3))
+    assert not box.contains_point(Point(8, 1, 8))
+
+
+def test_transform_box():
+    box = BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+    box2 = box.transform(RotationX(math.pi / 4) * RotationY(math.pi / 4))
+    assert box2.min == Point(-1.4142, -1.7071, -1.7071)
+    assert box2.max == Point(1.4142, 1.7071, 1.7071)
+
+
+def test_shape_parent_space_bounds():
+    s = Sphere()
+    s.set_transform(Translation(1, -3, 5) * Scaling(0.5, 2, 4))
+    box = s.parent_space_bounds()
+    assert box.min == Point(0.5, -5, 1)
+    assert box.max == Point(1.5, -1, 9)
+
+
+def test_box_ray_intersection():
+    box = BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+    assert box.intersects(Ray(Point(5, 0.5, 0), Vector(-1, 0, 0)))
+    assert box.intersects(Ray(Point(0, 0.5, 0), Vector(0, 0, 1)))
+    assert not box.intersects(Ray(Point(-2, 0, 0), Vector(2, 4, 6)))
+    assert not box.intersects(Ray(Point(2, 0, 2), Vector(0, 0, -1)))
+
+
+def test_group_bounds():
+    s = Sphere()
+    s.set_transform(Translation(2, 5, -3) * Scaling(2, 2, 2))
+    c = Cylinder()
+    c.minimum = -2
+    c.maximum = 2
+    c.set_transform(Translation(-4, -1, 4) * Scaling(0.5, 1, 0.5))
+    g = Group()
+    g.add_child(s)
+    g.add_child(c)
+    assert g.bounds() == BoundingBox(Point(-4.5, -3, -5), Point(4, 7, 4.5))
+
+
+def test_sphere_bounds():
+    assert Sphere().bounds() == BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
+
+def test_cube_bounds():
+    assert Cube().bounds() == BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
+
+def test_triangle_bounds():
+    t = Triangle(Point(-3, 7, 2), Point(6, 2, -4), Point(2, -1, -1))
+    assert t.bounds() == BoundingBox(Point(-3, -1, -4), Point(6, 7, 2))
+
+
+def test_plane_bounds():
+    box = Plane().bounds()
+    assert not box.is_finite()
+    assert box == BoundingBox(
+        Point(-math.inf, 0, -math.inf), Point(math.inf, 0, math.inf)
+    )
+
+
+def test_rotated_plane_bounds():
+    p = Plane()
+    p.set_transform(Translation(0, 0, 500) * RotationX(math.pi / 2))
+    box = p.parent_space_bounds()
+    assert box.min.x == -math.inf and box.max.x == math.inf
+    assert box.min.y == -math.inf and box.max.y == math.inf
+    assert math.isclose(box.min.z, 500) and math.isclose(box.max.z, 500)
+
+
+def test_infinite_cylinder_bounds():
+    box = Cylinder().bounds()
+    assert box == BoundingBox(Point(-1, -math.inf, -1), Point(1, math.inf, 1))
+
+
+def test_truncated_cylinder_bounds():
+    c = Cylinder()
+    c.minimum = -5
+    c.maximum = 3
+    assert c.bounds() == BoundingBox(Point(-1, -5, -1), Point(1, 3, 1))
+
+
+def test_infinite_cone_bounds():
+    box = Cone().bounds()
+    assert box == BoundingBox(
+        Point(-math.inf, -math.inf, -math.inf), Point(math.inf, math.inf, math.inf)
+    )
+
+
+def test_truncated_cone_bounds():
+    c = Cone()
+    c.minimum = -5
+    c.maximum = 3
+    assert c.bounds() == BoundingBox(Point(-5, -5, -5), Point(5, 3, 5))
+
+
+def test_infinite_box_ray_intersection():
+    box = Cylinder().bounds()
+    assert box.intersects(Ray(Point(0, 100, -5), Vector(0, 0, 1)))
+    assert box.intersects(Ray(Point(0.5, 0, 0), Vector(0, 1, 0)))
+    assert not box.intersects(Ray(Point(2, 0, 0), Vector(0, 1, 0)))
+
+
+def test_scaled_group_keeps_nearly_parallel_rays():
+    # In object space this ray's x direction is about 5e-5, under EPSILON.
+    g = Group()
+    s = Sphere()
+    g.add_child(s)
+    g.transform = Scaling(1000, 1000, 1000)
+    r = Ray(Point(-1050, 0, -5000), Vector(0.05, 0, 1).normalize())
+    lone = Sphere()
+    lone.transform = Scaling(1000, 1000, 1000)
+    assert len(lone.intersect(r)) == 2
+    assert len(g.intersect(r)) == 2
+    m = TriangleMesh()
+    for p in (Point(-1, -1, 0), Point(1, -1, 0), Point(0, 1, 0)):
+        m.add_vertex(p)
+    m.add_face(0, 1, 2)
+    m.transform = Scaling(1000, 1000, 1000)
+    r = Ray(Point(-1050, -900, -5000), Vector(0.05, 0, 1).normalize())
+    assert len(m.intersect(r)) == 1
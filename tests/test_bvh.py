@@ -0,0 +1,174 @@
+from raytracer.bvh import BVH
+from raytracer.shapes import Group, Sphere, Plane, Triangle
+from raytracer.world import World
+from raytracer.base import Point, Vector, Translation, Scaling
+from raytracer.rays import Ray
+
+
+def sphere_row(count):
+    spheres = []
+    for i in range(count):
+        s = Sphere()
+        s.set_transform(Translation(i * 3, 0, 0))
+        spheres.append(s)
+    return spheres
+
+
+def test_bvh_contains_all_shapes():
+    shapes = sphere_row(10)
+    bvh = BVH(shapes)
+    assert len(bvh) == 10
+    assert not bvh.root.is_leaf()
+
+
+def test_bvh_small_set_is_leaf():
+    shapes = sphere_row(3)
+    bvh = BVH(shapes)
+    assert bvh.root.is_leaf()
+    assert len(bvh.root.shapes) == 3
+
+
+def test_bvh_bounds():
+    bvh = BVH(sphere_row(4))
+    box = bvh.bounds()
+    assert box.min == Point(-1, -1, -1)
+    assert box.max == Point(10, 1, 1)
+
+
+def test_bvh_intersect_matches_linear():
+    shapes = sphere_row(20)
+    bvh = BVH(shapes)
+    r = Ray(Point(30, 0, -5), Vector(0, 0, 1))
+    xs = bvh.intersect(r)
+    assert len(xs) == 2
+    assert xs[0].object is shapes[10]
+    r = Ray(Point(-5, 0, 0), Vector(1, 0, 0))
+    assert len(bvh.intersect(r)) == 40
+
+
+def test_bvh_keeps_unbounded_shapes():
+    p = Plane()
+    shapes = sphere_row(8) + [p]
+    bvh = BVH(shapes)
+    assert bvh.unbounded == [p]
+    r = Ray(Point(100, 1, 0), Vector(0, -1, 0))
+    xs = bvh.intersect(r)
+    assert len(xs) == 1
+    assert xs[0].object is p
+
+
+def test_bvh_rebuild():
+    shapes = sphere_row(8)
+    bvh = BVH(shapes)
+    r = Ray(Point(100, 0, -5), Vector(0, 0, 1))
+    assert len(bvh.intersect(r)) == 0
+    shapes[0].set_transform(Translation(100, 0, 0))
+    bvh.rebuild(shapes)
+    assert len(bvh.intersect(r)) == 2
+
+
+def test_group_build_bvh():
+    g = Group()
+    for s in sphere_row(12):
+        g.add_child(s)
+    g.set_transform(Scaling(2, 2, 2))
+    g.build_bvh()
+    r = Ray(Point(12, 0, -10), Vector(0, 0, 1))
+    xs = g.intersect(r)
+    assert len(xs) == 2
+    assert xs[0].t == 8
+    assert xs[1].t == 12
+
+
+def test_add_child_drops_stale_bvh():
+    g = Group()
+    g.add_child(Sphere())
+    g.build_bvh()
+    g.add_child(Sphere())
+    assert g.bvh is None
+
+
+def test_group_bvh_follows_moved_child():
+    g = Group()
+    shapes = sphere_row(8)
+    for s in shapes:
+        g.add_child(s)
+    g.build_bvh()
+    shapes[0].transform = Translation(0, 10, 0)
+    r = Ray(Point(0, 10, -5), Vector(0, 0, 1))
+    assert len(g.intersect(r)) == 2
+    assert g.bvh is not None
+    assert g.hit(r).object is shapes[0]
+
+
+def test_group_bvh_of_triangles():
+    g = Group()
+    for i in range(16):
+        g.add_child(Triangle(Point(i, 0, 0), Point(i + 1, 0, 0), Point(i, 1, 0)))
+    g.build_bvh()
+    r = Ray(Point(5.25, 0.25, -2), Vector(0, 0, 1))
+    xs = g.intersect(r)
+    assert len(xs) == 1
+    assert xs[0].object is g.objects[5]
+
+
+def test_world_bvh_matches_linear():
+    w = World.default()
+    r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+    linear = [x.t for x in w.intersect(r)]
+    w.build_bvh()
+    assert [x.t for x in w.intersect(r)] == linear
+
+
+def test_world_bvh_follows_moved_objects():
+    w = World()
+    groups = []
+    for s in sphere_row(10):
+        g = Group()
+        g.add_child(s)
+        groups.append(g)
+    w.objects = groups
+    w.build_bvh()
+    s = groups[0].objects[0]
+    s.transform = Translation(0, 10, 0)
+    r = Ray(Point(0, 10, -5), Vector(0, 0, 1))
+    assert groups[0].hit(r).t == 4
+    assert w.hit(r).object is s
+    assert len(w.intersect(r)) == 2
+    s.transform[1][3] = 20
+    r = Ray(Point(0, 20, -5), Vector(0, 0, 1))
+    assert w.hit(r).t == 4
+    groups[1].transform = Translation(0, -10, 0)
+    r = Ray(Point(3, -10, -5), Vector(0, 0, 1))
+    assert w.is_occluded(r, 10)
+
+
+def test_bvh_hit_is_nearest():
+    shapes = sphere_row(20)
+    bvh = BVH(shapes)
+    r = Ray(Point(-5, 0, 0), Vector(1, 0, 0))
+    assert bvh.hit(r).object is shapes[0]
+    assert bvh.hit(r).t == 4
+    assert bvh.hit(r, 10).t == 12
+    assert bvh.hit(r, 12).object is shapes[3]
+    assert bvh.hit(r, 0, 3) is None
+    r = Ray(Point(100, 0, 0), Vector(-1, 0, 0))
+    assert bvh.hit(r).object is shapes[19]
+
+
+def test_bvh_intersect_within_interval():
+    bvh = BVH(sphere_row(20))
+    r = Ray(Point(-5, 0, 0), Vector(1, 0, 0))
+    xs = bvh.intersect(r, 0, 12)
+    assert sorted(x.t for x in xs) == [4, 6, 7, 9, 10]
+
+
+def test_group_hit_with_bvh():
+    g = Group()
+    for s in sphere_row(12):
+        g.add_child(s)
+    r = Ray(Point(-5, 0, 0), Vector(1, 0, 0))
+    linear = g.hit(r, 5)
+    g.build_bvh()
+    assert g.hit(r, 5) is not None
+    assert g.hit(r, 5).t == linear.t == 6
@@ -10,6 +10,8 @@ from raytracer.base import (
     Color,
 )
 from raytracer.world import World
+from raytracer.progress import RenderProgress, print_progress
+import io
 import math
 
 
@@ -66,3 +68,95 @@ def test_render():
     c.transform = ViewTransform(f, to, up)
     image = c.render(w)
     assert image.read_pixel(5, 5) == Color(0.38066, 0.47583, 0.2855)
+
+
+def test_tiles_cover_image():
+    c = Camera(10, 7, math.pi / 2)
+    tiles = list(c.tiles(4))
+    assert tiles[0] == (0, 0, 4, 4)
+    assert tiles[-1] == (8, 4, 10, 7)
+    covered = set()
+    for x0, y0, x1, y1 in tiles:
+        covered.update((x, y) for x in range(x0, x1) for y in range(y0, y1))
+    assert len(covered) == 70
+
+
+def tiled_camera():
+    c = Camera(11, 11, math.pi / 2)
+    c.transform = ViewTransform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+    return c
+
+
+def test_render_tiled_single_worker():
+    w = World.default()
+    c = tiled_camera()
+    image = c.render_tiled(w, workers=1, tile_size=4)
+    assert image.read_pixel(5, 5) == Color(0.38066, 0.47583, 0.2855)
+
+
+def test_render_tiled_matches_render():
+    w = World.default()
+    c = tiled_camera()
+    expected = c.render(w)
+    image = c.render_tiled(w, workers=2, tile_size=3)
+    for y in range(c.vsize):
+        for x in range(c.hsize):
+            assert image.read_pixel(x, y) == expected.read_pixel(x, y)
+
+
+def test_camera_view_follows_changes():
+    c = Camera(201, 101, math.pi / 2)
+    assert c.origin == Point(0, 0, 0)
+    c.transform = Translation(0, -2, 5)
+    assert c.origin == Point(0, 2, -5)
+    c.transform[1][3] = 0
+    assert c.origin == Point(0, 0, -5)
+    c.fov = math.pi / 3
+    c.hsize = 101
+    assert equal(c.pixel_size, 2 * math.tan(math.pi / 6) / 101)
+
+
+def test_bulk_rays_match_ray_for_pixel():
+    c = Camera(7, 5, math.pi / 2)
+    c.transform = RotationY(math.pi / 4) * Translation(0, -2, 5)
+    rays = list(c.rays())
+    assert [(x, y) for x, y, _ in rays[:8]] == [(x, 0) for x in range(7)] + [(0, 1)]
+    assert len(rays) == 35
+    for x, y, r in rays:
+        expected = c.ray_for_pixel(x, y)
+        assert r.origin == expected.origin
+        assert r.direction == expected.direction
+    tile = list(c.rays(2, 1, 4, 3))
+    assert [(x, y) for x, y, _ in tile] == [(2, 1), (3, 1), (2, 2), (3, 2)]
+    assert [x for x, _, _ in c.row_rays(4)] == list(range(7))
+
+
+def test_render_reports_progress_quietly(capsys):
+    w = World.default()
+    c = tiled_camera()
+    updates = []
+    c.render(w, progress=lambda p: updates.append((p.done, p.total, p.rays)))
+    assert capsys.readouterr().out == ""
+    assert len(updates) == c.vsize
+    assert updates[-1] == (c.vsize, c.vsize, c.hsize * c.vsize)
+
+
+def test_render_tiled_reports_tiles():
+    w = World.default()
+    c = tiled_camera()
+    updates = []
+    c.render_tiled(w, workers=2, tile_size=4, progress=updates.append)
+    last = updates[-1]
+    assert last.unit == "tile"
+    assert last.done == last.total == len(list(c.tiles(4)))
+    assert last.rays == c.hsize * c.vsize
+    assert last.eta == 0
+
+
+def test_print_progress():
+    p = RenderProgress(None, 4, "row")
+    assert p.eta == math.inf
+    p.update(1, 10)
+    out = io.StringIO()
+    print_progress(p, out)
+    assert out.getvalue().startswith("1/4 rows, ")
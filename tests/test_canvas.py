@@ -1,4 +1,6 @@
 from raytracer.base import Canvas, Color
+import io
+import pytest
 
 
 def test_canvas():
@@ -15,6 +17,21 @@ def test_write_canvas():
     red = Color(1, 0, 0)
     c.write_pixel(2, 3, red)
     assert c.read_pixel(2, 3) == red
+    assert c.pixels[3][2] == red
+    with pytest.raises(TypeError):
+        c.pixels[3][2] = Color(0, 1, 0)
+
+
+def test_pixel_outside_canvas():
+    c = Canvas(4, 3)
+    for x, y in [(4, 0), (-1, 1), (0, 3), (0, -1)]:
+        with pytest.raises(IndexError):
+            c.write_pixel(x, y, Color(1, 0, 0))
+        with pytest.raises(IndexError):
+            c.read_pixel(x, y)
+    with pytest.raises(IndexError):
+        c.write_span(-1, 1, [1, 0, 0])
+    assert c.buffer == Canvas(4, 3).buffer
 
 
 def test_header():
@@ -47,3 +64,70 @@ def test_long_ppm():
 def test_newline():
     c = Canvas(5, 3)
     assert c.to_ppm().endswith("\n")
+
+
+def test_binary_ppm():
+    c = Canvas(2, 2)
+    c.write_pixel(0, 0, Color(1.5, 0, 0))
+    c.write_pixel(1, 1, Color(0, 0.5, 1))
+    data = c.to_ppm_binary()
+    assert data.startswith(b"P6\n2 2\n255\n")
+    assert data[len(b"P6\n2 2\n255\n") :] == bytes(
+        [255, 0, 0, 0, 0, 0, 0, 0, 0, 0, 128, 255]
+    )
+
+
+def test_write_ppm_streams_same_text():
+    c = Canvas(10, 2, Color(1.0, 0.8, 0.6))
+    f = io.StringIO()
+    c.write_ppm(f)
+    assert f.getvalue() == c.to_ppm()
+
+
+def test_write_ppm_binary():
+    c = Canvas(5, 3, Color(0.2, 0.4, 0.6))
+    f = io.BytesIO()
+    c.write_ppm(f, binary=True)
+    assert f.getvalue() == c.to_ppm_binary()
+
+
+def test_binary_ppm_rounds_like_colors():
+    colors = [Color(0.8, 0.6, 1e-60), Color(1e-7, 1 / 255, 0.2 + 1e-6)]
+    c = Canvas(2, 1)
+    c.write_row(0, colors)
+    expected = [channel for color in colors for channel in color.to_rgb()]
+    assert list(c.to_ppm_binary()[len("P6\n2 1\n255\n") :]) == expected
+
+
+def test_canvas_buffer_is_compact():
+    c = Canvas(10, 20)
+    assert len(c.buffer) == 10 * 20 * 3
+    assert c.buffer.itemsize == 4
+
+
+def test_write_span():
+    c = Canvas(3, 2)
+    c.write_span(2, 0, [1, 0, 0, 0, 1, 0])
+    assert c.read_pixel(2, 0) == Color(1, 0, 0)
+    assert c.read_pixel(0, 1) == Color(0, 1, 0)
+    with pytest.raises(IndexError):
+        c.write_span(2, 1, [1, 0, 0, 0, 1, 0])
+
+
+def test_write_row():
+    c = Canvas(3, 2)
+    c.write_row(1, [Color(0.1, 0.2, 0.3), Color(0.4, 0.5, 0.6)], x=1)
+    assert c.read_pixel(0, 1) == Color(0, 0, 0)
+    assert c.read_pixel(1, 1) == Color(0.1, 0.2, 0.3)
+    assert c.read_pixel(2, 1) == Color(0.4, 0.5, 0.6)
+
+
+def test_write_tile():
+    c = Canvas(4, 4)
+    red, green, blue = Color(1, 0, 0), Color(0, 1, 0), Color(0, 0, 1)
+    c.write_tile(1, 2, [[red, green], [blue, Color(1, 1, 1)]])
+    assert c.read_pixel(1, 2) == red
+    assert c.read_pixel(2, 2) == green
+    assert c.read_pixel(1, 3) == blue
+    assert c.read_pixel(2, 3) == Color(1, 1, 1)
+    assert c.read_pixel(3, 3) == Color(0, 0, 0)
@@ -176,3 +176,15 @@ def test_end_normal_5():
 
 def test_end_normal_6():
     assert end_normal_helper(Point(0, 2, 0.5)) == Vector(0, 1, 0)
+
+
+def test_closed_cylinder_intersect_within_interval():
+    c = Cylinder()
+    c.minimum = 1
+    c.maximum = 2
+    c.closed = True
+    r = Ray(Point(0, 3, 0), Vector(0, -1, 0))
+    assert len(c.local_intersect(r)) == 2
+    xs = c.local_intersect(r, 0, 1.5)
+    assert len(xs) == 1
+    assert xs[0].t == 1
@@ -1,6 +1,9 @@
-from raytracer.shapes import Group, _TestShape, Sphere
+from raytracer.shapes import Group, _TestShape, Sphere, Instance
 from raytracer.base import Identity, Point, Vector, Translation, Scaling
 from raytracer.rays import Ray
+from raytracer.materials import Material
+from raytracer.world import World
+import pytest
 
 
 def test_group_creation():
@@ -52,3 +55,150 @@ def test_transformed_group():
     r = Ray(Point(10, 0, -10), Vector(0, 0, 1))
     xs = g.intersect(r)
     assert len(xs) == 2
+
+
+def test_group_bounds_miss_skips_children():
+    g = Group()
+    s = _TestShape()
+    g.add_child(s)
+    r = Ray(Point(0, 0, -5), Vector(0, 1, 0))
+    xs = g.intersect(r)
+    assert len(xs) == 0
+    assert not hasattr(s, "saved_ray")
+
+
+def test_group_bounds_hit_tests_children():
+    g = Group()
+    s = _TestShape()
+    g.add_child(s)
+    r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+    _ = g.intersect(r)
+    assert hasattr(s, "saved_ray")
+
+
+def test_group_bounds_follow_child_transform():
+    g = Group()
+    s = Sphere()
+    g.add_child(s)
+    r = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+    assert len(g.intersect(r)) == 0
+    s.set_transform(Translation(5, 0, 0))
+    assert len(g.intersect(r)) == 2
+
+
+def test_nested_group_bounds_follow_grandchild():
+    g1 = Group()
+    g2 = Group()
+    g1.add_child(g2)
+    s = Sphere()
+    g2.add_child(s)
+    r = Ray(Point(0, 5, -5), Vector(0, 0, 1))
+    assert len(g1.intersect(r)) == 0
+    s.transform = Translation(0, 5, 0)
+    assert len(g1.intersect(r)) == 2
+
+
+def test_group_bounds_follow_in_place_edits():
+    g1 = Group()
+    g2 = Group()
+    g1.add_child(g2)
+    s = Sphere()
+    g2.add_child(s)
+    for _ in range(8):
+        g2.add_child(Sphere())
+    g1.build_bvh()
+    r = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+    assert len(g1.intersect(r)) == 0
+    s.transform[0][3] = 5
+    assert len(g1.intersect(r)) == 2
+    prototype = Group()
+    p = Sphere()
+    prototype.add_child(p)
+    g3 = Group()
+    g3.add_child(Instance(prototype))
+    assert len(g3.intersect(r)) == 0
+    p.transform[0][3] = 5
+    assert len(g3.intersect(r)) == 2
+
+
+def test_instances_share_prototype():
+    g = Group()
+    s = Sphere()
+    s.transform = Translation(5, 0, 0)
+    g.add_child(s)
+    a = Instance(g)
+    b = Instance(g)
+    b.transform = Translation(0, 0, 10)
+    r = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+    xs = a.intersect(r)
+    assert [i.t for i in xs] == [4, 6]
+    assert xs[0].object is s and xs[1].object is s
+    assert xs[0].instance == (a, None)
+    assert [i.t for i in b.intersect(r)] == [14, 16]
+    assert b.hit(r).t == 14
+    assert s.parent is g and g.parent is None
+    assert b.bounds().min == Point(4, -1, -1)
+
+
+def test_instance_normal_and_material():
+    s = Sphere()
+    m = Material()
+    a = Instance(s, material=m)
+    a.transform = Translation(0, 1, 0)
+    i = a.hit(Ray(Point(0, 1, -5), Vector(0, 0, 1)))
+    assert i.surface.normal_at(Point(0, 1, -1), i) == Vector(0, 0, -1)
+    assert i.surface.material is m
+    assert (
+        Instance(s).hit(Ray(Point(0, 0, -5), Vector(0, 0, 1))).surface.material
+        is s.material
+    )
+
+
+def test_instance_prototype_needs_no_parent():
+    g = Group()
+    s = Sphere()
+    g.add_child(s)
+    with pytest.raises(TypeError):
+        Instance(s)
+
+
+def test_world_builds_shared_prototype_bvh_once():
+    g = Group()
+    g.add_child(Sphere())
+    w = World()
+    w.objects = [Instance(g) for _ in range(3)]
+    for x, instance in enumerate(w.objects):
+        instance.transform = Translation(3 * x, 0, 0)
+    w.build_bvh()
+    bvh = g.bvh
+    assert bvh is not None
+    w.build_bvh()
+    assert g.bvh is bvh
+    assert w.hit(Ray(Point(6, 0, -5), Vector(0, 0, 1))).surface.instance is w.objects[2]
+
+
+def test_nested_instances_refract_through_each_copy():
+    glass = Material()
+    glass.transparency = 1.0
+    glass.refractive_index = 1.5
+    s = Sphere()
+    s.material = glass
+    inner = Group()
+    inner.add_child(Instance(s))
+    outer = Instance(inner)
+    outer.transform = Scaling(2, 2, 2)
+    other = Instance(s)
+    other.transform = Scaling(3, 3, 3)
+    water = Material()
+    water.refractive_index = 1.33
+    other.material = water
+    r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+    xs = sorted(outer.intersect(r) + other.intersect(r))
+    assert [i.t for i in xs] == pytest.approx([2, 3, 7, 8])
+    assert xs[0].object is xs[1].object is s
+    comps = xs[1].prepare_computation(r, xs)
+    assert (comps.n1, comps.n2) == (1.33, 1.5)
+    assert comps.normalv == Vector(0, 0, -1)
+    assert comps.point == Point(0, 0, -2)
+    assert comps.object.world_to_object(Point(0, 0, -2)) == Point(0, 0, -1)
+    assert xs[2].prepare_computation(r, xs).n2 == 1.33
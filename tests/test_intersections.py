@@ -186,3 +186,19 @@ def test_schlick_small_angle():
     comps = xs[0].prepare_computation(r, xs)
     reflectance = comps.schlick()
     assert equal(reflectance, 0.48873)
+
+
+def test_refractive_indices_with_overlapping_shapes():
+    a = GlassSphere()
+    b = GlassSphere()
+    b.material.refractive_index = 2.0
+    xs = Intersections(
+        Intersection(1, a),
+        Intersection(2, b),
+        Intersection(3, a),
+        Intersection(4, b),
+    )
+    assert xs[1].refractive_indices(xs) == (1.5, 2.0)
+    assert xs[2].refractive_indices(xs) == (2.0, 2.0)
+    assert Intersection(3, a).refractive_indices(xs) == (2.0, 2.0)
+    assert xs[3].refractive_indices(xs) == (2.0, 1.0)
@@ -1,3 +1,4 @@
+import pytest
 from raytracer.base import Matrix, Tuple, Identity
 
 
@@ -180,3 +181,45 @@ def test_inverse_mult():
     b = Matrix([[8, 2, 2, 2], [3, -1, 7, 0], [7, 0, 5, 4], [6, -2, 0, 5]])
     c = a * b
     assert c * b.inverse() == a
+
+
+def cofactor_inverse(m):
+    d = sum(m[0][col] * m.cofactor(0, col) for col in range(m.size))
+    return Matrix(
+        [[m.cofactor(col, row) / d for col in range(m.size)] for row in range(m.size)]
+    )
+
+
+def test_closed_form_4x4_matches_cofactors():
+    a = Matrix([[3, -9, 7, 3], [3, -8, 2, -9], [-4, 4, 4, 1], [-6, 5, -1, 1]])
+    assert a.determinant() == sum(a[0][col] * a.cofactor(0, col) for col in range(4))
+    assert a.inverse() == cofactor_inverse(a)
+
+
+def test_3x3_inverse():
+    a = Matrix([[1, 2, 6], [-5, 8, -4], [2, 6, 4]])
+    assert a.inverse() == cofactor_inverse(a)
+    assert a * a.inverse() == Matrix([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+
+def test_5x5_generic_inverse():
+    a = Matrix(
+        [
+            [2, 0, 0, 0, 1],
+            [0, 3, 0, 0, 0],
+            [0, 0, 4, 0, 0],
+            [0, 0, 0, 5, 0],
+            [1, 0, 0, 0, 1],
+        ]
+    )
+    identity = Matrix([[1 if r == c else 0 for c in range(5)] for r in range(5)])
+    assert a * a.inverse() == identity
+
+
+def test_singular_inverse():
+    m = Matrix([[-4, 2, -2, -3], [9, 6, 2, 6], [0, -5, 1, -5], [0, 0, 0, 0]])
+    with pytest.raises(TypeError):
+        m.inverse()
+    m = Matrix([[1, 2, 3], [2, 4, 6], [0, 1, 1]])
+    with pytest.raises(TypeError):
+        m.inverse()
@@ -0,0 +1,128 @@
+import pytest
+from raytracer.mesh import TriangleMesh, intersect_triangles
+from raytracer.parser import Parser
+from raytracer.base import Point, Vector, Translation, equal
+from raytracer.rays import Ray
+import math
+import os
+
+path_to_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "obj_files")
+
+
+def grid_mesh(size):
+    m = TriangleMesh()
+    for y in range(size + 1):
+        for x in range(size + 1):
+            m.add_vertex(Point(x, y, 0))
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            m.add_polygon([a, a + 1, a + size + 2, a + size + 1])
+    return m
+
+
+def test_mesh_stores_faces_in_arrays():
+    m = grid_mesh(2)
+    assert len(m) == 8
+    assert len(m.vertices) == 27
+    assert list(m.faces[:3]) == [0, 1, 4]
+    t = m.triangle(0)
+    assert t.p1 == Point(0, 0, 0)
+    assert t.p2 == Point(1, 0, 0)
+    assert t.p3 == Point(1, 1, 0)
+    assert list(m.edges[:6]) == [1, 0, 0, 1, 1, 0]
+    assert list(m.normals[:3]) == [0, 0, -1]
+
+
+def test_mesh_bounds():
+    box = grid_mesh(3).bounds()
+    assert box.min == Point(0, 0, 0)
+    assert box.max == Point(3, 3, 0)
+
+
+def test_mesh_matches_triangles():
+    m = grid_mesh(6)
+    triangles = [m.triangle(face) for face in range(len(m))]
+    for x, y in [(0.3, 0.2), (2.9, 4.1), (5.5, 5.9), (3, 3), (7, 1)]:
+        r = Ray(Point(x, y, -2), Vector(0.01, 0.02, 1))
+        xs = m.local_intersect(r)
+        expected = [t for t in triangles if t.local_intersect(r)]
+        assert len(xs) == len(expected)
+        for i in xs:
+            assert m.triangle(i.face).p1 == triangles[i.face].p1
+
+
+def test_mesh_hit_and_normal():
+    m = grid_mesh(4)
+    m.set_transform(Translation(0, 0, 5))
+    r = Ray(Point(1.25, 2.5, 0), Vector(0, 0, 1))
+    hit = m.hit(r)
+    assert hit.t == 5
+    assert m.triangle(hit.face).bounds().contains_point(Point(1.25, 2.5, 0))
+    comps = hit.prepare_computation(r)
+    assert comps.normalv == Vector(0, 0, -1)
+    assert m.hit(r, 0, 4) is None
+    assert m.any_hit(r, 6)
+    assert not m.any_hit(r, 4)
+    with pytest.raises(TypeError):
+        m.normal_at(Point(1.25, 2.5, 5))
+
+
+def test_parser_builds_meshes():
+    p = Parser(open(os.path.join(path_to_dir, "groups.obj")), mesh=True)
+    g1 = p.get_named_group("FirstGroup")
+    g2 = p.get_named_group("SecondGroup")
+    m1 = g1.objects[0]
+    assert isinstance(m1, TriangleMesh)
+    assert m1.vertices is g2.objects[0].vertices
+    assert m1.triangle(0).p1 == p.vertices[1]
+    assert m1.triangle(0).p3 == p.vertices[3]
+    assert g2.objects[0].triangle(0).p3 == p.vertices[4]
+    assert len(p.default_group.objects) == 0
+
+
+def test_intersect_triangles_batch():
+    np = pytest.importorskip("numpy")
+    m = grid_mesh(3)
+    p1, e1, e2 = m.triangle_arrays()
+    face, t, u, v = intersect_triangles((1.75, 0.5, -2), (0, 0, 1), p1, e1, e2)
+    assert face[0] == 2
+    assert t[0] == 2
+    assert (u[0], v[0]) == (0.25, 0.5)
+    assert m.triangle(2).local_intersect(Ray(Point(1.75, 0.5, -2), Vector(0, 0, 1)))
+    face, t, u, v = intersect_triangles((1.75, 0.5, -2), (0, 0, 1), p1, e1, e2, 0, 1)
+    assert face[0] == -1
+
+
+def test_intersect_packet_matches_scalar():
+    np = pytest.importorskip("numpy")
+    m = grid_mesh(8)
+    m.set_transform(Translation(-4, -4, 3))
+    origins = []
+    directions = []
+    for i in range(60):
+        origins.append((0, 0, -5))
+        directions.append((math.cos(i) * 0.6, math.sin(i * 1.7) * 0.6, 1))
+    face, t, u, v = m.intersect_packet(np.array(origins), np.array(directions))
+    for i in range(60):
+        hit = m.hit(Ray(Point(*origins[i]), Vector(*directions[i])))
+        if hit is None:
+            assert face[i] == -1
+        else:
+            assert face[i] == hit.face
+            assert equal(t[i], hit.t)
+
+
+def test_mesh_smooth_normal():
+    m = TriangleMesh()
+    for point in (Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0)):
+        m.add_vertex(point)
+    for normal in (Vector(0, 1, 0), Vector(-1, 0, 0), Vector(1, 0, 0)):
+        m.add_vertex_normal(normal)
+    m.add_face(0, 1, 2, 0, 1, 2)
+    r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+    hit = m.hit(r)
+    assert equal(hit.u, 0.45)
+    assert equal(hit.v, 0.25)
+    comps = hit.prepare_computation(r)
+    assert comps.normalv == Vector(-0.5547, 0.83205, 0)
@@ -1,6 +1,11 @@
 from raytracer.parser import Parser
-from raytracer.base import Point
+from raytracer.base import Point, Vector, Translation
+from raytracer.bounds import BoundingBox
+from raytracer.rays import Ray
+from raytracer.shapes import SmoothTriangle
+import multiprocessing
 import os
+import pickle
 
 path_to_current_file = os.path.realpath(__file__)
 current_directory = os.path.dirname(path_to_current_file)
@@ -24,6 +29,9 @@ def test_vertex():
     assert p.vertices[2] == Point(-1, 0.5, 0)
     assert p.vertices[3] == Point(1, 0, 0)
     assert p.vertices[4] == Point(1, 1, 0)
+    assert p.vertices is p.vertices
+    p.parse(["v 2 2 2"])
+    assert p.vertices[5] == Point(2, 2, 2) == p.vertex(5)
 
 
 def test_faces():
@@ -81,3 +89,158 @@ def test_obj_to_group():
     g2 = p.get_named_group("SecondGroup")
     assert g1 in g.objects
     assert g2 in g.objects
+
+
+def test_obj_to_group_hierarchy():
+    p = Parser(open_obj("groups.obj"))
+    p.set_group("Empty")
+    g = p.obj_to_group()
+    g1 = p.get_named_group("FirstGroup")
+    assert g.objects == [g1, p.get_named_group("SecondGroup")]
+    assert g1.parent is g
+    assert g1.objects[0].parent is g1
+    assert g1.bvh is not None
+    assert g1.bounds() == BoundingBox(Point(-1, 0, 0), Point(1, 1, 0))
+    g.transform = Translation(0, 0, 5)
+    xs = g.intersect(Ray(Point(-0.5, 0.5, -5), Vector(0, 0, 1)))
+    assert len(xs) == 1
+    assert xs[0].t == 10
+    assert xs[0].object.parent is g1
+
+
+def test_vertex_normals():
+    p = Parser(open_obj("normals.obj"))
+    assert p.normals[1] == Vector(0, 0, 1)
+    assert p.normals[2] == Vector(0.707, 0, -0.707)
+    assert p.normals[3] == Vector(1, 2, 3)
+
+
+def test_faces_with_normals():
+    p = Parser(open_obj("face_normals.obj"))
+    t1 = p.default_group.objects[0]
+    t2 = p.default_group.objects[1]
+    assert isinstance(t1, SmoothTriangle)
+    assert t1.p1 == p.vertices[1]
+    assert t1.p2 == p.vertices[2]
+    assert t1.p3 == p.vertices[3]
+    assert t1.n1 == p.normals[3]
+    assert t1.n2 == p.normals[1]
+    assert t1.n3 == p.normals[2]
+    assert t2.p1 == t1.p1
+    assert t2.n1 == t1.n1
+    assert t2.n3 == t1.n3
+
+
+def test_faces_with_textures_only():
+    p = Parser(open_obj("textured.obj"))
+    assert p.textures[1] == (0.5, 1)
+    t = p.default_group.objects[0]
+    assert not isinstance(t, SmoothTriangle)
+    assert t.p2 == p.vertices[2]
+
+
+def test_mesh_faces_with_normals():
+    p = Parser(open_obj("face_normals.obj"), mesh=True)
+    m = p.default_group.objects[0]
+    assert len(m) == 2
+    t = m.triangle(1)
+    assert isinstance(t, SmoothTriangle)
+    assert t.n1 == p.normals[3]
+    assert t.n2 == p.normals[1]
+
+
+def test_tolerates_whitespace_and_blank_lines():
+    p = Parser(open_obj("messy.obj"))
+    assert len(p.vertices) == 5
+    assert p.vertices[2] == Point(-1, 0, 0)
+    assert p.vertices[3] == Point(1, 0, 0)
+    g = p.get_named_group("FirstGroup")
+    assert len(g.objects) == 2
+    assert g.objects[0].p1 == p.vertices[1]
+    assert g.objects[0].p3 == p.vertices[3]
+    assert g.objects[1].p3 == p.vertices[4]
+
+
+def test_reports_bad_lines():
+    p = Parser(open_obj("messy.obj"))
+    assert p.ignored == 3
+    assert [line for line, _ in p.errors] == [7, 11]
+    assert p.errors[0][1] == "v 1 x 0"
+
+
+def test_progress_callback():
+    calls = []
+    p = Parser(open_obj("messy.obj"), progress=lambda *args: calls.append(args))
+    assert calls[-1] == (13, 3)
+    assert p.lines == 13
+
+
+def test_load_uses_mesh_cache(tmp_path):
+    source = tmp_path / "messy.obj"
+    with open_obj("messy.obj") as f:
+        source.write_text(f.read())
+    p = Parser.load(str(source))
+    assert os.path.exists(str(source) + ".meshcache")
+    cached = Parser.load(str(source))
+    assert cached.vertex_buffer == p.vertex_buffer
+    assert cached.errors == p.errors
+    assert list(cached.named_groups) == ["FirstGroup"]
+    m = cached.get_named_group("FirstGroup").objects[0]
+    assert m._tree is not None
+    assert m.faces == p.get_named_group("FirstGroup").objects[0].faces
+    assert m.bounds() == p.get_named_group("FirstGroup").objects[0].bounds()
+
+
+def test_cached_mesh_is_mapped_until_changed(tmp_path):
+    source = tmp_path / "messy.obj"
+    with open_obj("messy.obj") as f:
+        source.write_text(f.read())
+    Parser.load(str(source))
+    p = Parser.load(str(source))
+    m = p.get_named_group("FirstGroup").objects[0]
+    assert isinstance(m.faces, memoryview) and m.vertices is p.vertex_buffer
+    copy = pickle.loads(pickle.dumps(m))
+    assert copy.faces == m.faces
+    assert copy.bounds() == m.bounds()
+    count = len(m)
+    m.add_polygon([1, 2, 3])
+    assert len(m) == count + 1 and len(m.normals) == 3 * (count + 1)
+    p.parse(["v 0 0 0"])
+    assert m.vertices is p.vertex_buffer
+    assert p.vertex(len(p.vertex_buffer) // 3 - 1) == Point(0, 0, 0)
+
+
+def test_stale_mesh_cache_is_ignored(tmp_path):
+    source = tmp_path / "face.obj"
+    source.write_text("v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n")
+    Parser.load(str(source))
+    source.write_text("v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\nf 1 2 3 4\n")
+    os.utime(source, ns=(0, 0))
+    p = Parser.load(str(source))
+    assert len(p.default_group.objects[0]) == 2
+
+
+def test_parallel_parse_matches_parse():
+    path = os.path.join(path_to_dir, "messy.obj")
+    p = Parser(open_obj("messy.obj"), mesh=True)
+    q = Parser(mesh=True)
+    q.parse_file(path, workers=2, chunk_size=16)
+    assert q.vertex_buffer == p.vertex_buffer
+    assert (q.lines, q.ignored, q.errors) == (p.lines, p.ignored, p.errors)
+    assert list(q.named_groups) == list(p.named_groups)
+    for name, group in p.named_groups.items():
+        m = q.named_groups[name].objects[0]
+        assert m.faces == group.objects[0].faces
+    t = Parser()
+    t.parse_file(path, workers=2, chunk_size=16)
+    g = t.get_named_group("FirstGroup")
+    assert g.objects[1].p3 == t.vertices[4]
+
+
+def test_parse_file_is_serial_by_default(monkeypatch):
+    monkeypatch.setattr(multiprocessing, "Pool", None)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    path = os.path.join(path_to_dir, "messy.obj")
+    q = Parser(mesh=True)
+    q.parse_file(path, chunk_size=16)
+    assert q.vertex_buffer == Parser(open_obj("messy.obj")).vertex_buffer
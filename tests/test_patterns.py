@@ -115,3 +115,13 @@ def test_checker_z():
     assert p.pattern_at(Point(0, 0, 0)) == white
     assert p.pattern_at(Point(0, 0, 0.99)) == white
     assert p.pattern_at(Point(0, 0, 1.01)) == black
+
+
+def test_cached_pattern_inverse():
+    pattern = _TestPattern()
+    pattern.set_pattern_transform(Scaling(2, 2, 2))
+    assert pattern.inverse == Scaling(0.5, 0.5, 0.5)
+    pattern.set_pattern_transform(Translation(1, 0, 0))
+    assert pattern.inverse == (Scaling(2, 2, 2) * Translation(1, 0, 0)).inverse()
+    pattern.transform[0][0] = 4
+    assert pattern.inverse == (Scaling(4, 2, 2) * Translation(0.5, 0, 0)).inverse()
@@ -33,3 +33,13 @@ def test_ray_scaling():
     r2 = r.transform(m)
     assert r2.origin == Point(2, 6, 12)
     assert r2.direction == Vector(0, 3, 0)
+
+
+def test_ray_affine_transform():
+    r = Ray(Point(1, 2, 3), Vector(0, 1, 0))
+    m = Translation(3, 4, 5) * Scaling(2, 3, 4)
+    r2 = r.transform(m.to_affine())
+    assert r2.origin == Point(5, 10, 17)
+    assert r2.direction == Vector(0, 3, 0)
+    assert r2.origin.isPoint()
+    assert r2.direction.isVector()
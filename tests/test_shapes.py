@@ -112,3 +112,93 @@ def test_child_normal():
     g2.add_child(s)
     n = s.normal_at(Point(1.7321, 1.1547, -5.5774))
     assert n == Vector(0.2857, 0.4286, -0.8571)
+
+
+def test_cached_inverse():
+    s = _TestShape()
+    s.set_transform(Translation(2, 3, 4))
+    assert s.inverse == Translation(-2, -3, -4)
+    assert s.inverse is s.inverse
+    assert s.inverse_transpose == Translation(-2, -3, -4).transpose()
+
+
+def test_cached_inverse_follows_set_transform():
+    s = _TestShape()
+    s.set_transform(Translation(2, 3, 4))
+    _ = s.inverse
+    s.set_transform(Scaling(2, 2, 2))
+    assert s.inverse == (Translation(2, 3, 4) * Scaling(2, 2, 2)).inverse()
+
+
+def test_cached_inverse_follows_assignment():
+    s = _TestShape()
+    _ = s.inverse
+    s.transform = Scaling(2, 2, 2)
+    assert s.inverse == Scaling(0.5, 0.5, 0.5)
+
+
+def test_cached_inverse_follows_mutation():
+    s = _TestShape()
+    s.transform = Translation(1, 0, 0)
+    _ = s.inverse
+    s.transform[0][3] = 5
+    assert s.inverse == Translation(-5, 0, 0)
+    s.transform[1] = [0, 2, 0, 0]
+    assert s.inverse == Translation(-5, 0, 0) * Scaling(1, 0.5, 1)
+
+
+def test_shapes_compare_by_identity():
+    a = Sphere()
+    b = Sphere()
+    assert a.id != b.id
+    assert a == a
+    assert a != b
+    assert a.equals(b)
+    assert len({a, b}) == 2
+    b.set_transform(Translation(1, 0, 0))
+    assert not a.equals(b)
+
+
+def test_equals_compares_parents_by_value():
+    g1 = Group()
+    g2 = Group()
+    g2.set_transform(Scaling(2, 2, 2))
+    a = Sphere()
+    b = Sphere()
+    g1.add_child(a)
+    g2.add_child(b)
+    assert not a.equals(b)
+    g2.transform = Identity()
+    assert a.equals(b)
+
+
+def test_world_to_object_follows_ancestor_changes():
+    g1 = Group()
+    g2 = Group()
+    g1.add_child(g2)
+    s = Sphere()
+    g2.add_child(s)
+    g1.flatten()
+    assert s.world_to_object(Point(2, 0, 0)) == Point(2, 0, 0)
+    g1.set_transform(Translation(1, 0, 0))
+    assert s.world_to_object(Point(2, 0, 0)) == Point(1, 0, 0)
+    g2.transform = Scaling(2, 2, 2)
+    assert s.world_to_object(Point(2, 0, 0)) == Point(0.5, 0, 0)
+    g0 = Group()
+    g0.set_transform(Translation(0, 1, 0))
+    g0.add_child(g1)
+    assert s.world_to_object(Point(2, 0, 0)) == Point(0.5, -0.5, 0)
+
+
+def test_world_to_object_follows_in_place_ancestor_edits():
+    g1 = Group()
+    g2 = Group()
+    g1.add_child(g2)
+    s = Sphere()
+    g2.add_child(s)
+    assert s.world_to_object(Point(0, 0, 0)) == Point(0, 0, 0)
+    g1.transform[0][3] = 5
+    assert s.world_to_object(Point(0, 0, 0)) == Point(-5, 0, 0)
+    g2.transform[1][1] = 2
+    assert s.world_to_object(Point(0, 4, 0)) == Point(-5, 2, 0)
+    assert s.normal_at(Point(6, 0, 0)) == Vector(1, 0, 0)
@@ -99,3 +99,14 @@ def test_glassy_sphere():
     assert s.transform == Identity()
     assert s.material.transparency == 1.0
     assert s.material.refractive_index == 1.5
+
+
+def test_sphere_intersect_within_interval():
+    r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+    s = Sphere()
+    xs = s.intersect(r, 0, 5)
+    assert len(xs) == 1
+    assert xs[0].t == 4.0
+    assert len(s.intersect(r, 6, math.inf)) == 0
+    assert s.hit(r).t == 4.0
+    assert s.hit(r, 4.5).t == 6.0
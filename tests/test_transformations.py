@@ -10,8 +10,12 @@ from raytracer.base import (
     Shearing,
     ViewTransform,
     Identity,
+    Affine,
 )
+from raytracer.shapes import Sphere
+from raytracer.rays import Ray
 import math
+import pytest
 
 
 def test_translation():
@@ -189,3 +193,53 @@ def test_arbitrary_orientation():
             [0.00000, 0.00000, 0.00000, 1.00000],
         ]
     )
+
+
+def test_affine_matches_matrix():
+    m = (
+        Translation(1, -2, 3)
+        * RotationY(math.pi / 3)
+        * Shearing(1, 0, 0, 0.5, 0, 0)
+        * Scaling(2, 3, 4)
+    )
+    a = m.to_affine()
+    p = Point(-3, 4, 5)
+    v = Vector(1, -2, 0.5)
+    assert a.apply_point(p) == m * p
+    assert a.apply_vector(v) == m * v
+    t = m.transpose() * v
+    assert a.apply_transpose(v) == Vector(t.x, t.y, t.z)
+    assert a.to_matrix() == m
+
+
+def test_affine_view_transform():
+    m = ViewTransform(Point(1, 3, 2), Point(4, -2, 8), Vector(1, 1, 0))
+    assert m.is_affine()
+    assert m.to_affine().apply_point(Point(4, -2, 8)) == m * Point(4, -2, 8)
+
+
+def test_affine_rejects_projective_matrix():
+    m = Matrix([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 1, 0]])
+    assert not m.is_affine()
+    with pytest.raises(TypeError):
+        Affine(m)
+
+
+def test_inverse_of_composite_rotations_is_affine():
+    # The cofactor sums can round the bottom-right entry of the inverse to
+    # 1 +- 1 ulp; it must still be exactly 0 0 0 1.
+    for i in range(20):
+        a = 0.37 * i
+        b = 0.91 * i + 0.2
+        m = (
+            RotationY(a)
+            * Scaling(1 + 0.3 * i, 1, 2.5 - 0.1 * i)
+            * RotationX(b)
+            * Shearing(0.1 * i, 0, 0.2, 0, 0, 0.05 * i)
+        )
+        inv = m.inverse()
+        assert list(inv[3]) == [0, 0, 0, 1]
+        Affine(inv)
+        s = Sphere()
+        s.transform = m
+        s.intersect(Ray(Point(0, 0, -20), Vector(0, 0, 1)))
@@ -1,6 +1,6 @@
-from raytracer.shapes import Triangle
-from raytracer.base import Point, Vector
-from raytracer.rays import Ray
+from raytracer.shapes import Triangle, SmoothTriangle
+from raytracer.base import Point, Vector, equal
+from raytracer.rays import Ray, Intersection, Intersections
 
 
 def test_triangle_creation():
@@ -60,3 +60,52 @@ def test_ray_hit():
     xs = t.local_intersect(r)
     assert len(xs) == 1
     assert xs[0].t == 2
+
+
+def smooth_triangle():
+    return SmoothTriangle(
+        Point(0, 1, 0),
+        Point(-1, 0, 0),
+        Point(1, 0, 0),
+        Vector(0, 1, 0),
+        Vector(-1, 0, 0),
+        Vector(1, 0, 0),
+    )
+
+
+def test_smooth_triangle_creation():
+    tri = smooth_triangle()
+    assert tri.p1 == Point(0, 1, 0)
+    assert tri.n1 == Vector(0, 1, 0)
+    assert tri.n2 == Vector(-1, 0, 0)
+    assert tri.n3 == Vector(1, 0, 0)
+
+
+def test_intersection_stores_u_v():
+    s = Triangle(Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0))
+    i = Intersection(3.5, s, u=0.2, v=0.4)
+    assert i.u == 0.2
+    assert i.v == 0.4
+
+
+def test_smooth_triangle_intersection_u_v():
+    tri = smooth_triangle()
+    r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+    xs = tri.local_intersect(r)
+    assert equal(xs[0].u, 0.45)
+    assert equal(xs[0].v, 0.25)
+
+
+def test_smooth_triangle_interpolates_normal():
+    tri = smooth_triangle()
+    i = Intersection(1, tri, u=0.45, v=0.25)
+    n = tri.normal_at(Point(0, 0, 0), i)
+    assert n == Vector(-0.5547, 0.83205, 0)
+
+
+def test_smooth_triangle_prepare_computation():
+    tri = smooth_triangle()
+    i = Intersection(1, tri, u=0.45, v=0.25)
+    r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+    comps = i.prepare_computation(r, Intersections(i))
+    assert comps.normalv == Vector(-0.5547, 0.83205, 0)
@@ -1,4 +1,4 @@
-from raytracer.base import Tuple, Point, Vector, equal
+from raytracer.base import Tuple, Point, Vector, Color, equal
 import math
 
 # TEST TUPLES
@@ -132,3 +132,34 @@ def test_reflect_slanted():
     n = Vector(math.sqrt(2) / 2, math.sqrt(2) / 2, 0)
     r = v.reflect(n)
     assert r == Vector(1, 0, 0)
+
+
+def test_tuples_have_no_dict():
+    for t in (Tuple(1, 2, 3, 0), Point(1, 2, 3), Vector(1, 2, 3), Color(1, 2, 3)):
+        assert not hasattr(t, "__dict__")
+
+
+def test_multiply_add():
+    a = Vector(1, 2, 3)
+    b = Vector(2, 0, -1)
+    assert a.multiply_add(b, 3) == a + b * 3
+    assert a == Vector(1, 2, 3)
+    assert isinstance(a.multiply_add(b, 3), Vector)
+
+
+def test_in_place_operations():
+    a = Color(0.1, 0.2, 0.3)
+    result = a.add_in_place(Color(0.1, 0.1, 0.1))
+    assert result is a
+    assert a == Color(0.2, 0.3, 0.4)
+    a.scale_in_place(2)
+    assert a == Color(0.4, 0.6, 0.8)
+    a.multiply_add_in_place(Color(1, 0, 1), 0.5)
+    assert a == Color(0.9, 0.6, 1.3)
+
+
+def test_normalize_in_place():
+    v = Vector(1, 2, 3)
+    expected = v.normalize()
+    assert v.normalize_in_place() is v
+    assert v == expected
@@ -0,0 +1,113 @@
+import pytest
+from raytracer.camera import Camera
+from raytracer.world import World
+from raytracer.shapes import (
+    Sphere,
+    GlassSphere,
+    Plane,
+    Cube,
+    Cylinder,
+    Cone,
+    Triangle,
+    Group,
+)
+from raytracer.base import (
+    Point,
+    Vector,
+    Color,
+    Translation,
+    Scaling,
+    RotationY,
+    ViewTransform,
+)
+from raytracer.patterns import (
+    CheckersPattern,
+    StripePattern,
+    RingPattern,
+    GradientPattern,
+)
+import math
+
+np = pytest.importorskip("numpy")
+
+
+def assert_same_image(a, b):
+    assert a.width == b.width and a.height == b.height
+    for y in range(a.height):
+        for x in range(a.width):
+            assert a.read_pixel(x, y) == b.read_pixel(x, y)
+
+
+def camera(hsize, vsize):
+    c = Camera(hsize, vsize, math.pi / 3)
+    c.transform = ViewTransform(Point(0, 1.5, -5), Point(0, 0.5, 0), Vector(0, 1, 0))
+    return c
+
+
+def shapes_world():
+    w = World.default()
+    floor = Plane()
+    floor.set_transform(Translation(0, -1, 0))
+    floor.material.pattern = CheckersPattern(Color(1, 1, 1), Color(0, 0, 0))
+    floor.material.reflective = 0.5
+    cube = Cube()
+    cube.set_transform(Translation(2, 0, 1) * RotationY(0.5) * Scaling(0.5, 0.5, 0.5))
+    cube.material.pattern = StripePattern(Color(1, 0, 0), Color(0, 0, 1))
+    cube.material.pattern.set_pattern_transform(Scaling(0.2, 0.2, 0.2))
+    cylinder = Cylinder()
+    cylinder.minimum = 0
+    cylinder.maximum = 1
+    cylinder.closed = True
+    cylinder.set_transform(Translation(-2, -1, 1) * Scaling(0.5, 1, 0.5))
+    cylinder.material.pattern = RingPattern(Color(1, 1, 0), Color(0, 1, 1))
+    cone = Cone()
+    cone.minimum = -1
+    cone.maximum = 0
+    cone.closed = True
+    cone.set_transform(Translation(0, 1.5, 1))
+    cone.material.pattern = GradientPattern(Color(1, 0, 0), Color(0, 1, 0))
+    triangle = Triangle(Point(-1, 2, 2), Point(1, 2, 2), Point(0, 3, 2))
+    glass = GlassSphere()
+    glass.set_transform(Translation(1, 0.5, -1.5) * Scaling(0.4, 0.4, 0.4))
+    glass.material.reflective = 0.9
+    w.objects.extend([floor, cube, cylinder, cone, triangle, glass])
+    return w
+
+
+def test_wavefront_default_world():
+    w = World.default()
+    c = Camera(11, 11, math.pi / 2)
+    c.transform = ViewTransform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+    image = c.render_wavefront(w)
+    assert image.read_pixel(5, 5) == Color(0.38066, 0.47583, 0.2855)
+
+
+def test_wavefront_matches_scalar_render():
+    w = shapes_world()
+    c = camera(32, 16)
+    assert_same_image(c.render(w), c.render_wavefront(w))
+
+
+def test_wavefront_falls_back_for_groups():
+    w = shapes_world()
+    g = Group()
+    s = Sphere()
+    s.set_transform(Translation(-1.5, 0.5, -1) * Scaling(0.3, 0.3, 0.3))
+    g.add_child(s)
+    w.objects.append(g)
+    c = camera(24, 12)
+    assert_same_image(c.render(w), c.render_wavefront(w))
+
+
+def test_wavefront_small_batches():
+    w = shapes_world()
+    c = camera(16, 8)
+    assert_same_image(c.render(w), c.render_wavefront(w, batch_size=20))
+
+
+def test_wavefront_reports_progress():
+    w = shapes_world()
+    c = camera(16, 8)
+    done = []
+    c.render_wavefront(w, batch_size=48, progress=lambda p: done.append(p.done))
+    assert done == [3, 6, 8]
@@ -2,7 +2,7 @@ from raytracer.world import World
 from raytracer.base import Point, Vector, Color, Scaling, Translation, EPSILON
 from raytracer.materials import Material
 from raytracer.rays import Ray, Intersection, Intersections
-from raytracer.shapes import Sphere, Plane
+from raytracer.shapes import Sphere, Plane, Group
 from raytracer.lights import PointLight
 from raytracer.patterns import _TestPattern
 import math
@@ -27,8 +27,8 @@ def test_default_world():
     s2.set_transform(t)
     w = World.default()
     assert w.light == light
-    assert s1 in w.objects
-    assert s2 in w.objects
+    assert any(s1.equals(obj) for obj in w.objects)
+    assert any(s2.equals(obj) for obj in w.objects)
 
 
 def test_ray_world():
@@ -298,3 +298,46 @@ def shade_hit_reflective_transparent():
     comps = xs[0].prepare_computations(r, xs)
     color = w.shade_hit(comps, 5)
     assert color == Color(0.93391, 0.69643, 0.69243)
+
+
+def test_is_occluded_respects_max_distance():
+    w = World.default()
+    r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+    assert w.is_occluded(r, 10)
+    assert not w.is_occluded(r, 4)
+    assert not w.is_occluded(Ray(Point(0, 0, 5), Vector(0, 0, 1)), 100)
+
+
+def test_is_occluded_inside_group():
+    w = World()
+    g = Group()
+    s = Sphere()
+    s.set_transform(Translation(0, 0, 5))
+    g.add_child(s)
+    w.objects.append(g)
+    r = Ray(Point(0, 0, 0), Vector(0, 0, 1))
+    assert w.is_occluded(r, 4.5)
+    assert not w.is_occluded(r, 3.5)
+
+
+def test_is_occluded_with_bvh():
+    w = World.default()
+    for i in range(8):
+        s = Sphere()
+        s.set_transform(Translation(i * 3, 10, 0))
+        w.objects.append(s)
+    w.light = PointLight(Point(10.5, 20, 0), Color(1, 1, 1))
+    w.build_bvh()
+    assert w.is_shadowed(Point(9, 5, 0))
+    assert not w.is_shadowed(Point(10.5, 5, 0))
+    assert w.is_occluded(Ray(Point(-5, 10, 0), Vector(1, 0, 0)), 5)
+    assert not w.is_occluded(Ray(Point(-5, 10, 0), Vector(1, 0, 0)), 3)
+
+
+def test_world_hit_is_nearest_positive():
+    w = World.default()
+    r = Ray(Point(0, 0, 0), Vector(0, 0, 1))
+    assert w.hit(r).t == 0.5
+    assert w.hit(r, 0.5).t == 1
+    assert w.hit(r, 1) is None
+    assert [x.t for x in w.intersect(r, -0.75, 0.75)] == [-0.5, 0.5]